@@ -8,6 +8,7 @@ This CDK app creates all resources for the S3 bucket size tracking system:
 - SizeTrackingStack: Lambda function triggered by S3 events
 - PlottingStack: Lambda function with API Gateway and matplotlib layer
 - DriverStack: Lambda function for testing (optional)
+- AggregationStack: DynamoDB Streams consumer for aggregates (optional)
 """
 
 import aws_cdk as cdk
@@ -15,14 +16,23 @@ from stacks.storage_stack import StorageStack
 from stacks.size_tracking_stack import SizeTrackingStack
 from stacks.plotting_stack import PlottingStack
 from stacks.driver_stack import DriverStack
+from stacks.aggregation_stack import AggregationStack
 
 
 app = cdk.App()
 
+# "inline" updates aggregates in the size-tracking lambda; "stream" moves
+# them to a DynamoDB Streams consumer (AggregationStack)
+aggregation_mode = app.node.try_get_context("aggregation_mode") or "inline"
+
+# Fraction of invocations of every function written out as sampled profiles
+profile_sample_rate = float(app.node.try_get_context("profile_sample_rate") or 0)
+
 # Stack 1: Create storage resources (S3 + DynamoDB)
 storage_stack = StorageStack(
     app,
     "S3SizeTrackingStorageStack",
+    enable_stream=aggregation_mode == "stream",
     description="Storage resources: S3 bucket and DynamoDB table for size tracking"
 )
 
@@ -32,16 +42,40 @@ size_tracking_stack = SizeTrackingStack(
     "S3SizeTrackingSizeTrackingStack",
     bucket=storage_stack.bucket,
     table=storage_stack.table,
+    tracking_mode=app.node.try_get_context("tracking_mode") or "full",
+    aggregation_mode=aggregation_mode,
+    prefix_depth=int(app.node.try_get_context("prefix_depth") or 0),
+    recount_concurrency=int(app.node.try_get_context("recount_concurrency") or 1),
+    coalesce_interval=int(app.node.try_get_context("coalesce_interval") or 0),
+    event_buffer=app.node.try_get_context("event_buffer") or "direct",
+    queue_batch_size=int(app.node.try_get_context("queue_batch_size") or 100),
+    queue_batching_window=int(app.node.try_get_context("queue_batching_window") or 5),
+    timestamp_precision=int(app.node.try_get_context("timestamp_precision") or 0),
+    profile_sample_rate=profile_sample_rate,
     description="Size-tracking Lambda function triggered by S3 events"
 )
 size_tracking_stack.add_dependency(storage_stack)
 
+# Optional: maintain aggregates from the table's stream
+if aggregation_mode == "stream":
+    aggregation_stack = AggregationStack(
+        app,
+        "S3SizeTrackingAggregationStack",
+        table=storage_stack.table,
+        bucket=storage_stack.bucket,
+        profile_sample_rate=profile_sample_rate,
+        description="DynamoDB Streams consumer maintaining size history aggregates"
+    )
+    aggregation_stack.add_dependency(storage_stack)
+
 # Stack 3: Create plotting lambda with API Gateway
 plotting_stack = PlottingStack(
     app,
     "S3SizeTrackingPlottingStack",
     bucket=storage_stack.bucket,
     table=storage_stack.table,
+    renderer=app.node.try_get_context("plot_renderer") or "matplotlib",
+    profile_sample_rate=profile_sample_rate,
     description="Plotting Lambda function with REST API Gateway"
 )
 plotting_stack.add_dependency(storage_stack)
@@ -51,7 +85,9 @@ driver_stack = DriverStack(
     app,
     "S3SizeTrackingDriverStack",
     bucket=storage_stack.bucket,
+    table=storage_stack.table,
     api_url=plotting_stack.api_url,
+    profile_sample_rate=profile_sample_rate,
     description="Driver Lambda function for testing the system"
 )
 driver_stack.add_dependency(storage_stack)
@@ -82,5 +118,13 @@ cdk.CfnOutput(
     export_name="S3SizeTrackingApiUrl"
 )
 
+if size_tracking_stack.queue is not None:
+    cdk.CfnOutput(
+        size_tracking_stack,
+        "QueueArnOutput",
+        value=size_tracking_stack.queue.queue_arn,
+        description="SQS queue buffering S3 event notifications",
+    )
+
 app.synth()
 
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for the size-tracking, plotting and driver Lambdas.
+
+Each handler runs in-process against moto's in-memory S3 and DynamoDB, so
+no AWS account is needed. For every scenario the harness reports latency
+percentiles, AWS API calls per invocation (counted with botocore event
+hooks) and peak Python heap usage (tracemalloc, measured on a separate
+invocation so it does not skew the timings). Results are written as JSON;
+pass an earlier results file with --compare to see p50/p99 changes.
+
+Usage:
+    pip install -r requirements-dev.txt
+    python3 benchmarks/run_benchmarks.py --output bench.json
+    python3 benchmarks/run_benchmarks.py --bucket-sizes 100,5000 --bursts 1,50 \\
+        --history-lengths 1000,50000 --compare bench.json
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(REPO_ROOT, 'lambda_code')
+# Deployed as a layer; importable from /opt/python in Lambda
+SHARED_DIR = os.path.join(LAMBDA_DIR, 'shared', 'python')
+sys.path.insert(0, SHARED_DIR)
+
+# Shared with the driver's load reports, so both rank samples the same way
+from instrumentation import percentiles  # noqa: E402
+
+TABLE_NAME = 'bench-size-history'
+BUCKET_NAME = 'bench-tracked-bucket'
+
+
+class ApiCallCounter:
+    """Counts AWS API calls ('s3.ListObjectsV2', ...) made by any boto3 client."""
+
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self.enabled = False
+
+    def __call__(self, event_name: str, **kwargs: Any) -> None:
+        if self.enabled:
+            # event_name is 'before-call.<service>.<Operation>'
+            self.calls[event_name.split('.', 1)[1]] += 1
+
+    @contextlib.contextmanager
+    def counting(self):
+        self.calls = Counter()
+        self.enabled = True
+        try:
+            yield self.calls
+        finally:
+            self.enabled = False
+
+
+_handlers: Dict[str, Any] = {}
+
+
+def load_handler(directory: str):
+    """Import lambda_code/<directory>/index.py under a unique module name, once."""
+    if directory in _handlers:
+        return _handlers[directory]
+    path = os.path.join(LAMBDA_DIR, directory)
+    sys.path.insert(0, path)
+    try:
+        spec = importlib.util.spec_from_file_location(f'{directory}_index', os.path.join(path, 'index.py'))
+        module = importlib.util.module_from_spec(spec)
+        with contextlib.redirect_stdout(io.StringIO()):
+            spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(path)
+    _handlers[directory] = module
+    return module
+
+
+def measure(name: str, params: Dict[str, Any], invoke: Callable[[int], Any], iterations: int,
+            counter: ApiCallCounter, verbose: bool = False) -> Dict[str, Any]:
+    """Time `iterations` invocations, then one more under tracemalloc for peak memory."""
+    latencies = []
+    calls: Counter = Counter()
+    sink = sys.stdout if verbose else io.StringIO()
+    for i in range(iterations):
+        with counter.counting() as per_call, contextlib.redirect_stdout(sink):
+            started = time.perf_counter()
+            invoke(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+        calls.update(per_call)
+
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(sink):
+            invoke(iterations)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'phase': name,
+        'params': params,
+        'iterations': iterations,
+        'latency_ms': percentiles(latencies),
+        'api_calls_per_invocation': {op: round(n / iterations, 2) for op, n in sorted(calls.items())},
+        'peak_memory_bytes': peak,
+    }
+    print(f"{name:<14} {json.dumps(params):<48} p50 {result['latency_ms']['p50']:>9.2f} ms  "
+          f"p99 {result['latency_ms']['p99']:>9.2f} ms  calls {sum(calls.values()) / iterations:>7.1f}  "
+          f"peak {peak / 1e6:>7.2f} MB", file=sys.stderr)
+    return result
+
+
+def s3_event(keys: List[str], size: int, sequence: int, event_name: str = 'ObjectCreated:Put',
+             bucket: str = BUCKET_NAME) -> Dict[str, Any]:
+    """An S3 notification with one record per key."""
+    event_time = datetime.utcnow().isoformat(timespec='milliseconds') + 'Z'
+    return {'Records': [
+        {
+            'eventName': event_name,
+            'eventTime': event_time,
+            's3': {
+                'bucket': {'name': bucket},
+                'object': {'key': key, 'size': size, 'sequencer': f'{sequence:016X}{i:08X}'},
+            },
+        }
+        for i, key in enumerate(keys)
+    ]}
+
+
+def bench_size_tracking(args, counter, s3, tracker) -> List[Dict[str, Any]]:
+    results = []
+    existing = 0
+    for bucket_size in args.bucket_sizes:
+        # Grow the bucket to the next size; objects are tiny, only the count matters
+        for i in range(existing, bucket_size):
+            s3.put_object(Bucket=BUCKET_NAME, Key=f'data/{i % 10}/object-{i:07d}', Body=b'x' * 16)
+        existing = bucket_size
+
+        for burst in args.bursts:
+            def invoke(i: int, burst=burst) -> None:
+                keys = [f'data/{k % 10}/object-{k:07d}' for k in range(burst)]
+                response = tracker.lambda_handler(s3_event(keys, 16, i), None)
+                if response['statusCode'] != 200:
+                    raise RuntimeError(response['body'])
+
+            results.append(measure('size_tracking', {'bucket_objects': bucket_size, 'burst_events': burst},
+                                   invoke, args.iterations, counter, args.verbose))
+    return results
+
+
+def seed_history(table, bucket: str, length: int) -> None:
+    """Write `length` one-second-apart history rows ending now, plus the stats item."""
+    now = int(time.time())
+    with table.batch_writer() as batch:
+        for i in range(length):
+            batch.put_item(Item={
+                'bucket_name': bucket,
+                'timestamp': now - length + i,
+                'total_size': 1000 + (i * 7919) % 5000,
+                'object_count': 10 + i % 50,
+                'recorded_at': datetime.utcfromtimestamp(now - length + i).isoformat() + 'Z',
+                'triggered_by': 'ObjectCreated:Put',
+                'event_count': 1,
+            })
+    table.put_item(Item={'bucket_name': bucket + '#stats', 'timestamp': 0, 'historical_high': Decimal(5999)})
+
+
+def plot_event(resource: str, query: Dict[str, str]) -> Dict[str, Any]:
+    return {'resource': resource, 'queryStringParameters': query, 'headers': {}}
+
+
+def bench_plotting(args, counter, s3, dynamodb, plotter) -> List[Dict[str, Any]]:
+    results = []
+    table = dynamodb.Table(TABLE_NAME)
+    for length in args.history_lengths:
+        # The plot is uploaded to the bucket it shows
+        bucket = f'history-{length}'
+        s3.create_bucket(Bucket=bucket)
+        seed_history(table, bucket, length)
+        for resource in ('/plot', '/series'):
+            def invoke(i: int, resource=resource) -> None:
+                # A different window per call changes the render fingerprint,
+                # so every /plot call renders and uploads instead of hitting the cache
+                query = {'bucket': bucket, 'window': str(length + 5 + i), 'renderer': args.renderer, 'tier': 'raw'}
+                response = plotter.lambda_handler(plot_event(resource, query), None)
+                if response['statusCode'] != 200:
+                    raise RuntimeError(response['body'])
+
+            results.append(measure('plotting', {'resource': resource, 'history_rows': length,
+                                                'renderer': args.renderer},
+                                   invoke, args.iterations, counter, args.verbose))
+    return results
+
+
+class _PlotApi(BaseHTTPRequestHandler):
+    """Local stand-in for API Gateway, serving the plotting handler in-process."""
+
+    plotter = None
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        response = self.plotter.lambda_handler(plot_event(url.path, dict(parse_qsl(url.query))), None)
+        body = response['body'].encode('utf-8')
+        self.send_response(response['statusCode'])
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class S3Notifier:
+    """
+    Stands in for S3 event notifications, which moto does not deliver.
+
+    PutObject and DeleteObject calls made through any boto3 client are
+    forwarded to the size-tracking handler synchronously, so the driver's
+    polling finds its history rows. The tracker's API calls are counted
+    with the caller's.
+    """
+
+    def __init__(self) -> None:
+        self.tracker = None
+        self.sequence = 0
+
+    def capture(self, params: Dict[str, Any], context: Dict[str, Any], **kwargs: Any) -> None:
+        if self.tracker is not None:
+            body = params.get('Body') or b''
+            size = len(body.encode('utf-8') if isinstance(body, str) else body)
+            context['bench_notification'] = (params['Bucket'], params['Key'], size)
+
+    def notify(self, model, context: Dict[str, Any], **kwargs: Any) -> None:
+        if self.tracker is None or 'bench_notification' not in context:
+            return
+        bucket, key, size = context.pop('bench_notification')
+        event_name = 'ObjectRemoved:Delete' if model.name == 'DeleteObject' else 'ObjectCreated:Put'
+        self.sequence += 1
+        self.tracker.lambda_handler(s3_event([key], size, self.sequence, event_name, bucket), None)
+
+    def register(self, events) -> None:
+        for operation in ('PutObject', 'DeleteObject'):
+            events.register(f'before-parameter-build.s3.{operation}', self.capture)
+            events.register(f'after-call.s3.{operation}', self.notify)
+
+
+def bench_driver(args, counter, notifier, plotter) -> List[Dict[str, Any]]:
+    _PlotApi.plotter = plotter
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PlotApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['PLOTTING_API_URL'] = (f'http://127.0.0.1:{server.server_address[1]}/plot'
+                                      f'?bucket={BUCKET_NAME}&renderer={args.renderer}')
+    # The driver polls for the rows the tracker writes on each notification
+    notifier.tracker = load_handler('size_tracking')
+    try:
+        driver = load_handler('driver')
+
+        def invoke(i: int) -> None:
+            response = driver.lambda_handler({}, None)
+            if response['statusCode'] != 200 or json.loads(response['body'])['results']['errors']:
+                raise RuntimeError(response['body'])
+
+        return [measure('driver', {'renderer': args.renderer}, invoke, args.iterations, counter, args.verbose)]
+    finally:
+        notifier.tracker = None
+        server.shutdown()
+
+
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    """Print p50/p99 changes against an earlier results file, scenario by scenario."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    def key(result: Dict[str, Any]) -> str:
+        return result['phase'] + ' ' + json.dumps(result['params'], sort_keys=True)
+
+    previous = {key(r): r for r in baseline['results']}
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit') or 'unknown commit'}):", file=sys.stderr)
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        changes = []
+        for p in ('p50', 'p99'):
+            before, after = old['latency_ms'][p], result['latency_ms'][p]
+            changes.append(f"{p} {before:.2f} -> {after:.2f} ms ({(after - before) / before * 100 if before else 0:+.1f}%)")
+        print(f"  {key(result)}: {', '.join(changes)}", file=sys.stderr)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bucket-sizes', type=_int_list, default=[100, 1000],
+                        help='Objects in the tracked bucket (comma separated)')
+    parser.add_argument('--bursts', type=_int_list, default=[1, 25],
+                        help='S3 event records per size-tracking invocation (comma separated)')
+    parser.add_argument('--history-lengths', type=_int_list, default=[100, 5000],
+                        help='History rows behind each plot (comma separated)')
+    parser.add_argument('--iterations', type=int, default=20, help='Timed invocations per scenario')
+    parser.add_argument('--renderer', default='svg', help='Plot renderer: svg, png or matplotlib')
+    parser.add_argument('--tracking-mode', default='full', choices=['full', 'incremental'])
+    parser.add_argument('--phases', default='size_tracking,plotting,driver',
+                        help='Which handlers to benchmark (comma separated)')
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    parser.add_argument('--verbose', action='store_true', help='Show handler output')
+    args = parser.parse_args(argv)
+    phases = set(args.phases.split(','))
+
+    try:
+        import boto3
+        from moto import mock_aws
+    except ImportError:
+        sys.exit("The benchmarks need boto3 and moto: pip install -r requirements-dev.txt")
+
+    # Handlers read their configuration at import time
+    os.environ.update({
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'TABLE_NAME': TABLE_NAME,
+        'BUCKET_NAME': BUCKET_NAME,
+        'TRACKING_MODE': args.tracking_mode,
+        'RENDERER': args.renderer,
+        # Without a tracker behind them, driver polls should fail fast
+        'POLL_TIMEOUT_SECONDS': '5',
+    })
+
+    counter = ApiCallCounter()
+    notifier = S3Notifier()
+    results: List[Dict[str, Any]] = []
+    with mock_aws():
+        # Clients copy the session's event hooks when created, so register
+        # before any handler module creates its clients
+        boto3.setup_default_session()
+        boto3.DEFAULT_SESSION.events.register('before-call', counter)
+        notifier.register(boto3.DEFAULT_SESSION.events)
+
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket=BUCKET_NAME)
+        dynamodb = boto3.resource('dynamodb')
+        dynamodb.create_table(
+            TableName=TABLE_NAME,
+            KeySchema=[{'AttributeName': 'bucket_name', 'KeyType': 'HASH'},
+                       {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}],
+            AttributeDefinitions=[{'AttributeName': 'bucket_name', 'AttributeType': 'S'},
+                                  {'AttributeName': 'timestamp', 'AttributeType': 'N'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+
+        if 'size_tracking' in phases:
+            results += bench_size_tracking(args, counter, s3, load_handler('size_tracking'))
+        if phases & {'plotting', 'driver'}:
+            plotter = load_handler('plotting')
+            if 'plotting' in phases:
+                results += bench_plotting(args, counter, s3, dynamodb, plotter)
+            if 'driver' in phases:
+                results += bench_driver(args, counter, notifier, plotter)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'recorded_at': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'verbose')},
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,182 +2,162 @@
 """
 Driver Lambda Function
 Orchestrates S3 operations and calls plotting API for testing.
+
+Instead of sleeping a fixed time between steps, the driver polls the
+history table until the tracker has recorded the totals it expects, with
+a deadline and exponential backoff. With {"mode": "load"} it runs a load
+scenario instead (see scenario.py) and reports throughput, tracking lag
+and plot API latency.
 """
 
 import json
+import threading
 import time
-import urllib.request
-import urllib.error
 import os
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+from http.client import HTTPException
+from typing import Dict, Any, List, Optional
 
-import boto3
+from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 
+from clients import client, http_client, resource
+from instrumentation import metrics, percentiles
+from profiling import is_profile_key, profiler
+from scenario import OPERATIONS, load_scenario, run_worker
+
+# Seconds to wait for each expected history row, and the backoff between polls
+POLL_TIMEOUT_SECONDS = float(os.environ.get('POLL_TIMEOUT_SECONDS', '30'))
+POLL_INITIAL_DELAY_SECONDS = 0.2
+POLL_MAX_DELAY_SECONDS = 2.0
+
+# Objects the plotting API writes into the tracked bucket (/plot and /dashboard)
+PLOT_OUTPUT_KEYS = ('plot', 'dashboard')
 
+# Smoke test steps: (step, operation, key, content); DELETE has no content
+SMOKE_STEPS = [
+    (1, 'CREATE', 'assignment1.txt', 'Empty Assignment 1'),
+    (2, 'UPDATE', 'assignment1.txt', 'Empty Assignment 2222222222'),
+    (3, 'DELETE', 'assignment1.txt', None),
+    (4, 'CREATE', 'assignment2.txt', '33'),
+]
+
+
+@metrics.handler('driver')
+@profiler.sampled
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Driver Lambda handler that performs S3 operations and calls plotting API.
-    
+
     Args:
-        event: Lambda event (can be empty for manual invocation)
+        event: Lambda event; empty for the smoke test, or {"mode": "load",
+            "scenario": <name or object>} plus optional field overrides
+            for a load run
         context: Lambda context object
-    
+
     Returns:
         Response with operation results and plot generation status
     """
-    
+
     try:
         # Get configuration from environment variables (set by CDK)
         BUCKET_NAME = os.environ.get('BUCKET_NAME')
+        TABLE_NAME = os.environ.get('TABLE_NAME')
         PLOTTING_API_URL = os.environ.get('PLOTTING_API_URL')
-        
+
         if not BUCKET_NAME:
             raise ValueError("BUCKET_NAME environment variable not set")
+        if not TABLE_NAME:
+            raise ValueError("TABLE_NAME environment variable not set")
         if not PLOTTING_API_URL or PLOTTING_API_URL == "PLACEHOLDER":
             raise ValueError("PLOTTING_API_URL environment variable not set or is placeholder")
-        
-        # Initialize S3 client
-        s3_client = boto3.client('s3')
-        
+
+        event = event or {}
+        if event.get('mode') == 'load':
+            return run_load(event, BUCKET_NAME, TABLE_NAME, PLOTTING_API_URL, context)
+
+        # Cached across warm invocations
+        s3_client = client('s3')
+        table = resource('dynamodb').Table(TABLE_NAME)
+
         results = {
             "operations": [],
             "plot_generation": None,
             "errors": []
         }
-        
+
         print(f"Starting driver lambda operations on bucket: {BUCKET_NAME}")
-        
-        # Operation 1: Create assignment1.txt
-        try:
-            s3_client.put_object(
-                Bucket=BUCKET_NAME,
-                Key="assignment1.txt",
-                Body="Empty Assignment 1",
-                ContentType="text/plain"
-            )
-            results["operations"].append({
-                "step": 1,
-                "operation": "CREATE assignment1.txt",
-                "content": "Empty Assignment 1",
-                "size": 18,
-                "status": "success"
-            })
-            print("✓ Created assignment1.txt (18 bytes)")
-            
-        except Exception as e:
-            error_msg = f"Failed to create assignment1.txt: {str(e)}"
-            results["errors"].append(error_msg)
-            print(f"✗ {error_msg}")
-        
-        # Sleep between operations (longer for first operation to ensure tracking lambda completes)
-        print("Sleeping 6 seconds...")
-        time.sleep(6)
-        
-        # Operation 2: Update assignment1.txt
-        try:
-            s3_client.put_object(
-                Bucket=BUCKET_NAME,
-                Key="assignment1.txt",
-                Body="Empty Assignment 2222222222",
-                ContentType="text/plain"
-            )
-            results["operations"].append({
-                "step": 2,
-                "operation": "UPDATE assignment1.txt",
-                "content": "Empty Assignment 2222222222",
-                "size": 27,
-                "status": "success"
-            })
-            print("✓ Updated assignment1.txt (27 bytes)")
-            
-        except Exception as e:
-            error_msg = f"Failed to update assignment1.txt: {str(e)}"
-            results["errors"].append(error_msg)
-            print(f"✗ {error_msg}")
-        
-        # Sleep between operations
-        print("Sleeping 2 seconds...")
-        time.sleep(2)
-        
-        # Operation 3: Delete assignment1.txt
-        try:
-            s3_client.delete_object(
-                Bucket=BUCKET_NAME,
-                Key="assignment1.txt"
-            )
-            results["operations"].append({
-                "step": 3,
-                "operation": "DELETE assignment1.txt",
-                "content": "",
-                "size": 0,
-                "status": "success"
-            })
-            print("✓ Deleted assignment1.txt (0 bytes)")
-            
-        except Exception as e:
-            error_msg = f"Failed to delete assignment1.txt: {str(e)}"
-            results["errors"].append(error_msg)
-            print(f"✗ {error_msg}")
-        
-        # Sleep between operations
-        print("Sleeping 2 seconds...")
-        time.sleep(2)
-        
-        # Operation 4: Create assignment2.txt
-        try:
-            s3_client.put_object(
-                Bucket=BUCKET_NAME,
-                Key="assignment2.txt",
-                Body="33",
-                ContentType="text/plain"
-            )
+
+        # What the tracker should report after each step, starting from the
+        # bucket as it is now
+        expected = list_bucket_sizes(s3_client, BUCKET_NAME)
+
+        for step, operation, key, content in SMOKE_STEPS:
+            size = len(content.encode('utf-8')) if content is not None else 0
+            started = time.time()
+            try:
+                if operation == 'DELETE':
+                    s3_client.delete_object(Bucket=BUCKET_NAME, Key=key)
+                    expected.pop(key, None)
+                else:
+                    s3_client.put_object(
+                        Bucket=BUCKET_NAME,
+                        Key=key,
+                        Body=content,
+                        ContentType="text/plain"
+                    )
+                    expected[key] = size
+                print(f"✓ {operation.capitalize()}d {key} ({size} bytes)")
+            except Exception as e:
+                error_msg = f"Failed to {operation.lower()} {key}: {str(e)}"
+                results["errors"].append(error_msg)
+                print(f"✗ {error_msg}")
+                continue
+
+            # Wait for the tracker instead of sleeping a fixed time
+            tracking = wait_for_totals(table, BUCKET_NAME, sum(expected.values()), len(expected), started)
+            if tracking["status"] != "confirmed":
+                results["errors"].append(f"Step {step} not tracked within {POLL_TIMEOUT_SECONDS}s")
             results["operations"].append({
-                "step": 4,
-                "operation": "CREATE assignment2.txt",
-                "content": "33",
-                "size": 2,
-                "status": "success"
+                "step": step,
+                "operation": f"{operation} {key}",
+                "content": content or "",
+                "size": size,
+                "status": "success",
+                "tracking": tracking
             })
-            print("✓ Created assignment2.txt (2 bytes)")
-            
-        except Exception as e:
-            error_msg = f"Failed to create assignment2.txt: {str(e)}"
-            results["errors"].append(error_msg)
-            print(f"✗ {error_msg}")
-        
-        # Wait for size-tracking lambda to process all events
-        print("Waiting 2 seconds for size-tracking lambda to process all events...")
-        time.sleep(2)
-        
+            print(f"  tracking {tracking['status']} after {tracking['waited_ms']} ms")
+
         # Operation 5: Call plotting API
         try:
             print(f"Calling plotting API: {PLOTTING_API_URL}")
-            
-            # Use urllib instead of requests
-            req = urllib.request.Request(PLOTTING_API_URL)
-            with urllib.request.urlopen(req, timeout=30) as response:
-                if response.status == 200:
-                    plot_data = json.loads(response.read().decode('utf-8'))
-                    results["plot_generation"] = {
-                        "status": "success",
-                        "api_response": plot_data,
-                        "plot_url": f"s3://{BUCKET_NAME}/plot"
-                    }
-                    print(f"✓ Plot generated successfully: {plot_data}")
-                else:
-                    error_msg = f"Plotting API returned status {response.status}"
-                    results["plot_generation"] = {
-                        "status": "failed",
-                        "error": error_msg
-                    }
-                    results["errors"].append(error_msg)
-                    print(f"✗ {error_msg}")
-                
-        except urllib.error.URLError as e:
-            error_msg = f"Failed to call plotting API (URL error): {str(e)}"
+
+            # Kept-alive connection, reused by later calls and warm invocations
+            with metrics.span('plot_api'):
+                status, body = http_client.request('GET', PLOTTING_API_URL, timeout=30)
+            if status == 200:
+                plot_data = json.loads(body.decode('utf-8'))
+                results["plot_generation"] = {
+                    "status": "success",
+                    "api_response": plot_data,
+                    "plot_url": f"s3://{BUCKET_NAME}/plot"
+                }
+                print(f"✓ Plot generated successfully: {plot_data}")
+            else:
+                error_msg = f"Plotting API returned status {status}"
+                results["plot_generation"] = {
+                    "status": "failed",
+                    "error": error_msg
+                }
+                results["errors"].append(error_msg)
+                print(f"✗ {error_msg}")
+
+        except (OSError, HTTPException) as e:
+            error_msg = f"Failed to call plotting API (connection error): {str(e)}"
             results["plot_generation"] = {
-                "status": "failed", 
+                "status": "failed",
                 "error": error_msg
             }
             results["errors"].append(error_msg)
@@ -185,21 +165,23 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         except Exception as e:
             error_msg = f"Failed to call plotting API: {str(e)}"
             results["plot_generation"] = {
-                "status": "failed", 
+                "status": "failed",
                 "error": error_msg
             }
             results["errors"].append(error_msg)
             print(f"✗ {error_msg}")
-        
+
         # Summary
         successful_ops = len([op for op in results["operations"] if op["status"] == "success"])
-        total_ops = len(results["operations"])
-        
+        total_ops = len(SMOKE_STEPS)
+        metrics.count('s3_operations', successful_ops)
+        metrics.count('operation_errors', len(results["errors"]))
+
         print(f"\n=== DRIVER LAMBDA SUMMARY ===")
         print(f"Successful operations: {successful_ops}/{total_ops}")
         print(f"Plot generation: {results['plot_generation']['status'] if results['plot_generation'] else 'Not attempted'}")
         print(f"Errors: {len(results['errors'])}")
-        
+
         return {
             'statusCode': 200,
             'body': json.dumps({
@@ -210,7 +192,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'results': results
             }, indent=2)
         }
-        
+
     except Exception as e:
         error_msg = f"Driver lambda failed: {str(e)}"
         print(f"✗ {error_msg}")
@@ -221,3 +203,243 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             })
         }
 
+
+def list_bucket_sizes(s3_client, bucket_name: str) -> Dict[str, int]:
+    """Map every object the tracker counts (profiles excluded) to its size."""
+    sizes = {}
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        for obj in page.get('Contents', []):
+            if not is_profile_key(obj['Key']):
+                sizes[obj['Key']] = obj['Size']
+    return sizes
+
+
+def refresh_sizes(s3_client, bucket_name: str, keys, sizes: Dict[str, int]) -> None:
+    """Update `sizes` with the current size of each key, dropping keys that no longer exist."""
+    for key in keys:
+        try:
+            sizes[key] = s3_client.head_object(Bucket=bucket_name, Key=key)['ContentLength']
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+                raise
+            sizes.pop(key, None)
+
+
+def wait_for_totals(table, bucket_name: str, total_size: int, object_count: int,
+                    since: float) -> Dict[str, Any]:
+    """
+    Poll the history partition until a row recorded since `since` has the expected totals.
+
+    Polls back off exponentially from POLL_INITIAL_DELAY_SECONDS up to
+    POLL_MAX_DELAY_SECONDS. Only rows from the last whole second before
+    `since` on are read, which covers both integer and fractional sort keys.
+
+    Returns:
+        {"status": "confirmed" | "timeout", "waited_ms", "polls"} plus the
+        matching row's timestamp when confirmed
+    """
+    started = time.monotonic()
+    deadline = started + POLL_TIMEOUT_SECONDS
+    delay = POLL_INITIAL_DELAY_SECONDS
+    polls = 0
+    while True:
+        polls += 1
+        with metrics.span('poll_history'):
+            row = _find_row(table, bucket_name, int(since), total_size, object_count)
+        waited_ms = round((time.monotonic() - started) * 1000, 1)
+        if row is not None:
+            return {"status": "confirmed", "waited_ms": waited_ms, "polls": polls,
+                    "timestamp": float(row['timestamp'])}
+        if time.monotonic() + delay > deadline:
+            return {"status": "timeout", "waited_ms": waited_ms, "polls": polls}
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_DELAY_SECONDS)
+
+
+def _find_row(table, bucket_name: str, since: int, total_size: int,
+              object_count: int) -> Optional[Dict[str, Any]]:
+    kwargs = {
+        'KeyConditionExpression': Key('bucket_name').eq(bucket_name) & Key('timestamp').gte(since),
+        'ProjectionExpression': '#ts, total_size, object_count',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        # Newest first: the row for the latest step is the likeliest match
+        'ScanIndexForward': False,
+    }
+    while True:
+        response = table.query(**kwargs)
+        for item in response.get('Items', []):
+            if int(item.get('total_size', -1)) == total_size and int(item.get('object_count', -1)) == object_count:
+                return item
+        if 'LastEvaluatedKey' not in response:
+            return None
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def run_load(event: Dict[str, Any], bucket_name: str, table_name: str,
+             plotting_api_url: str, context: Any) -> Dict[str, Any]:
+    """
+    Run a load scenario (see scenario.py) and report what the system sustained.
+
+    Workers issue the scenario's operations with bounded parallelism while
+    a background thread calls the plotting API. Afterwards the driver waits
+    for the tracker to converge on the final totals and reads the history
+    rows written during the run for the tracking lag: recorded_at minus
+    last_event_time, i.e. from the S3 write to the DynamoDB row.
+    """
+    scenario = load_scenario(event)
+    time_limit = scenario.duration_seconds or None
+    if context is not None:
+        # Keep enough of the invocation to wait for convergence (twice with cleanup)
+        budget = (context.get_remaining_time_in_millis() / 1000
+                  - POLL_TIMEOUT_SECONDS * (2 if scenario.cleanup else 1) - 10)
+        if time_limit is None or time_limit > budget:
+            time_limit = max(1.0, budget)
+    quotas: List[Optional[int]] = [None] * scenario.concurrency
+    if scenario.operations > 0:
+        base, extra = divmod(scenario.operations, scenario.concurrency)
+        quotas = [base + (1 if i < extra else 0) for i in range(scenario.concurrency)]
+
+    # One pooled connection per worker thread; clients are thread-safe
+    s3_client = client('s3', max_pool_connections=scenario.concurrency)
+    table = resource('dynamodb').Table(table_name)
+    baseline = list_bucket_sizes(s3_client, bucket_name)
+
+    def put(key: str, body: bytes) -> None:
+        s3_client.put_object(Bucket=bucket_name, Key=key, Body=body)
+
+    def delete(key: str) -> None:
+        s3_client.delete_object(Bucket=bucket_name, Key=key)
+
+    print(f"Load scenario {scenario.name}: {json.dumps(asdict(scenario))}")
+    plot_latencies: List[float] = []
+    plot_errors: List[str] = []
+    stop_plotting = threading.Event()
+    plotter = threading.Thread(
+        target=_sample_plot_api,
+        args=(plotting_api_url, scenario.plot_interval_seconds, stop_plotting, plot_latencies, plot_errors),
+        daemon=True,
+    )
+
+    started_at = time.time()
+    started = time.perf_counter()
+    deadline = time.monotonic() + time_limit if time_limit else None
+    if scenario.plot_interval_seconds > 0:
+        plotter.start()
+    with ThreadPoolExecutor(max_workers=scenario.concurrency) as pool:
+        outcomes = list(pool.map(
+            lambda i: run_worker(scenario, i, baseline, put, delete, quotas[i], deadline),
+            range(scenario.concurrency)
+        ))
+    elapsed = time.perf_counter() - started
+    stop_plotting.set()
+    if plotter.is_alive():
+        plotter.join()
+
+    scenario_keys = set(scenario.keys())
+    expected = {k: v for k, v in baseline.items() if k not in scenario_keys}
+    for outcome in outcomes:
+        expected.update(outcome['sizes'])
+    # The plot calls rewrote the plotting outputs at sizes only S3 knows
+    refresh_sizes(s3_client, bucket_name, PLOT_OUTPUT_KEYS, expected)
+    tracking = wait_for_totals(table, bucket_name, sum(expected.values()), len(expected), started_at)
+
+    issued = sum(o['issued'] for o in outcomes)
+    failed = sum(o['failed'] for o in outcomes)
+    result = {
+        'scenario': asdict(scenario),
+        'elapsed_seconds': round(elapsed, 2),
+        'operations': {
+            'issued': issued,
+            'failed': failed,
+            'ops_per_second': round((issued - failed) / elapsed, 1) if elapsed else None,
+            'latency_ms': {op: percentiles([ms for o in outcomes for ms in o['latencies'][op]])
+                           for op in OPERATIONS},
+            'errors': [e for o in outcomes for e in o['errors']][:10],
+        },
+        'tracking': tracking,
+        'tracking_lag_ms': tracking_lag(table, bucket_name, started_at),
+    }
+
+    if scenario.cleanup:
+        leftover = [key for outcome in outcomes for key in outcome['sizes']]
+        cleanup_started_at = time.time()
+        with ThreadPoolExecutor(max_workers=scenario.concurrency) as pool:
+            cleanup_errors = [e for e in pool.map(lambda key: _try(delete, key), leftover) if e]
+        for key in leftover:
+            expected.pop(key, None)
+        result['cleanup'] = {
+            'deleted': len(leftover) - len(cleanup_errors),
+            'errors': cleanup_errors[:10],
+            'tracking': wait_for_totals(table, bucket_name, sum(expected.values()), len(expected),
+                                        cleanup_started_at),
+        }
+
+    # A last plot call once nothing is awaited any more (it rewrites the plot),
+    # so even short runs report plot latency
+    _sample_plot_api(plotting_api_url, 0, None, plot_latencies, plot_errors)
+    result['plot_api_ms'] = percentiles(plot_latencies)
+    result['plot_api_errors'] = plot_errors[:10]
+
+    metrics.count('s3_operations', issued - failed)
+    metrics.count('operation_errors', failed)
+    print(f"Load scenario {scenario.name} finished: {json.dumps(result)}")
+    return {'statusCode': 200, 'body': json.dumps(result, indent=2)}
+
+
+def tracking_lag(table, bucket_name: str, since: float) -> Optional[Dict[str, float]]:
+    """
+    Percentiles of S3-write-to-row lag over the history rows caused by events since `since`.
+
+    Each row's lag is its recorded_at minus the latest S3 eventTime it
+    includes; rows whose events predate `since` are left out.
+    """
+    kwargs = {
+        'KeyConditionExpression': Key('bucket_name').eq(bucket_name) & Key('timestamp').gte(int(since)),
+        'ProjectionExpression': 'recorded_at, last_event_time',
+    }
+    # eventTime has millisecond precision
+    since = int(since * 1000) / 1000
+    lags = []
+    while True:
+        response = table.query(**kwargs)
+        for item in response.get('Items', []):
+            if 'recorded_at' not in item or 'last_event_time' not in item:
+                continue
+            event_time = _epoch(item['last_event_time'])
+            if event_time >= since:
+                lags.append((_epoch(item['recorded_at']) - event_time) * 1000)
+        if 'LastEvaluatedKey' not in response:
+            return percentiles(lags)
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _epoch(iso_time: str) -> float:
+    """Epoch seconds of a UTC ISO-8601 time such as S3's eventTime."""
+    return datetime.fromisoformat(iso_time.rstrip('Z')).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _sample_plot_api(url: str, interval: float, stop: Optional[threading.Event],
+                     latencies: List[float], errors: List[str]) -> None:
+    """Call the plotting API every `interval` seconds until `stop` is set (once without it)."""
+    while True:
+        started = time.perf_counter()
+        try:
+            with metrics.span('plot_api'):
+                status, _ = http_client.request('GET', url, timeout=30)
+            if status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors.append(f"status {status}")
+        except Exception as e:
+            errors.append(str(e))
+        if stop is None or stop.wait(interval):
+            return
+
+
+def _try(operation, key: str) -> Optional[str]:
+    try:
+        operation(key)
+        return None
+    except Exception as e:
+        return f"{key}: {str(e)}"
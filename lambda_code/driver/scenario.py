@@ -0,0 +1,199 @@
+"""
+Load scenarios for the driver.
+
+A scenario describes a key space under a prefix, the operation mix and
+object size distribution, how many worker threads issue operations and
+for how long. It comes from the invocation payload, either inline or as
+the name of a JSON file in scenarios/:
+
+    {"mode": "load", "scenario": "churn"}
+    {"mode": "load", "scenario": {"objects": 1000, "mix": {"create": 0.5, "delete": 0.5}}}
+
+Each worker owns a fixed slice of the key space (key index modulo the
+concurrency) and applies its operations in order, so operations on one key
+never race and the final bucket state is known exactly.
+"""
+
+import json
+import math
+import os
+import random
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+OPERATIONS = ('create', 'overwrite', 'delete')
+DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+# Objects are generated in memory; keep a single body well under the function's memory
+MAX_OBJECT_SIZE = 64 * 1024 * 1024
+
+
+@dataclass
+class Scenario:
+    name: str = 'default'
+    # Distinct keys, '<prefix>object-000000' and up
+    objects: int = 100
+    prefix: str = 'load/'
+    # Stop after this many operations, or after duration_seconds if set
+    # (0 = no limit; whichever is reached first)
+    operations: int = 100
+    duration_seconds: float = 0
+    # Worker threads, and an optional total rate limit across them
+    concurrency: int = 16
+    rate_per_second: float = 0
+    # Relative weights; create falls back to overwrite once every key
+    # exists, overwrite and delete fall back to create when none does
+    mix: Dict[str, float] = field(default_factory=lambda: {'create': 1.0})
+    # {"distribution": "fixed", "size": n} | "uniform" with min/max |
+    # "lognormal" with median/sigma (and an optional max)
+    sizes: Dict[str, Any] = field(default_factory=lambda: {'distribution': 'fixed', 'size': 1024})
+    # Seconds between plot API calls during the run; 0 calls it once at the end
+    plot_interval_seconds: float = 1.0
+    # Delete the scenario's keys afterwards (tracked like the run itself)
+    cleanup: bool = True
+    seed: Optional[int] = None
+
+    def key(self, index: int) -> str:
+        return f"{self.prefix}object-{index:06d}"
+
+    def keys(self) -> List[str]:
+        return [self.key(i) for i in range(self.objects)]
+
+    def validate(self) -> None:
+        if self.objects < 1 or self.concurrency < 1:
+            raise ValueError("Scenario needs at least one object and one worker")
+        if self.operations <= 0 and self.duration_seconds <= 0:
+            raise ValueError("Scenario needs an operation count or a duration")
+        unknown = set(self.mix) - set(OPERATIONS)
+        if unknown or not any(self.mix.get(op, 0) > 0 for op in OPERATIONS):
+            raise ValueError(f"Scenario mix needs positive weights for {', '.join(OPERATIONS)} only")
+        if self.sizes.get('distribution', 'fixed') not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown size distribution; choose one of: {', '.join(DISTRIBUTIONS)}")
+
+    def sample_size(self, rng: random.Random) -> int:
+        spec = self.sizes
+        distribution = spec.get('distribution', 'fixed')
+        if distribution == 'uniform':
+            size = rng.randint(int(spec.get('min', 0)), int(spec['max']))
+        elif distribution == 'lognormal':
+            size = int(rng.lognormvariate(math.log(max(1, int(spec['median']))), float(spec.get('sigma', 1.0))))
+            size = min(size, int(spec.get('max', MAX_OBJECT_SIZE)))
+        else:
+            size = int(spec.get('size', 1024))
+        return max(0, min(size, MAX_OBJECT_SIZE))
+
+    def pick_operation(self, rng: random.Random) -> str:
+        weights = [max(0.0, float(self.mix.get(op, 0))) for op in OPERATIONS]
+        return rng.choices(OPERATIONS, weights)[0]
+
+
+def load_scenario(event: Dict[str, Any]) -> Scenario:
+    """
+    Build the scenario for a load invocation.
+
+    "scenario" is an inline object or the name of scenarios/<name>.json;
+    top-level event fields named like scenario fields override it, and
+    "object_size" is shorthand for a fixed size.
+    """
+    spec = event.get('scenario') or {}
+    if isinstance(spec, str):
+        name = os.path.basename(spec)
+        with open(os.path.join(SCENARIO_DIR, name if name.endswith('.json') else name + '.json')) as f:
+            spec = dict(json.load(f), name=name.rsplit('.json', 1)[0])
+    names = {f.name for f in fields(Scenario)}
+    unknown = set(spec) - names
+    if unknown:
+        raise ValueError(f"Unknown scenario field(s): {', '.join(sorted(unknown))}")
+    values = dict(spec)
+    values.update((k, v) for k, v in event.items() if k in names and k != 'name')
+    if 'object_size' in event:
+        values['sizes'] = {'distribution': 'fixed', 'size': int(event['object_size'])}
+    scenario = Scenario(**values)
+    scenario.validate()
+    # Workers without keys of their own would idle
+    scenario.concurrency = min(scenario.concurrency, scenario.objects)
+    return scenario
+
+
+def run_worker(scenario: Scenario, index: int, existing: Dict[str, int],
+               put: Callable[[str, bytes], None], delete: Callable[[str], None],
+               quota: Optional[int], deadline: Optional[float]) -> Dict[str, Any]:
+    """
+    Issue one worker's operations on its slice of the key space.
+
+    Args:
+        scenario: The scenario being run
+        index: Worker number; the worker owns keys index, index + concurrency, ...
+        existing: Sizes of the keys present before the run
+        put: Called with (key, body) to create or overwrite an object
+        delete: Called with the key to delete
+        quota: Operations to issue; None means until the deadline
+        deadline: time.monotonic() value to stop at, if any
+
+    Returns:
+        Final sizes of the worker's present keys, operations issued and
+        failed, the first few errors and per-operation latencies in
+        milliseconds
+    """
+    seed = None if scenario.seed is None else f"{scenario.seed}-{index}"
+    rng = random.Random(seed)
+    owned = [scenario.key(i) for i in range(index, scenario.objects, scenario.concurrency)]
+    sizes = {key: existing[key] for key in owned if key in existing}
+    present = list(sizes)
+    absent = [key for key in owned if key not in sizes]
+    # Pace this worker at its share of the total rate
+    interval = scenario.concurrency / scenario.rate_per_second if scenario.rate_per_second > 0 else 0
+    next_at = time.monotonic()
+
+    latencies: Dict[str, List[float]] = {op: [] for op in OPERATIONS}
+    errors: List[str] = []
+    issued = 0
+    failed = 0
+    while owned and (quota is None or issued < quota):
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        if interval:
+            next_at += interval
+            pause = next_at - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+
+        operation = scenario.pick_operation(rng)
+        if operation == 'create' and not absent:
+            operation = 'overwrite'
+        elif operation != 'create' and not present:
+            operation = 'create'
+
+        pool = absent if operation == 'create' else present
+        position = rng.randrange(len(pool))
+        key = pool[position]
+        size = scenario.sample_size(rng) if operation != 'delete' else 0
+
+        started = time.perf_counter()
+        try:
+            if operation == 'delete':
+                delete(key)
+            else:
+                put(key, b'x' * size)
+        except Exception as e:
+            failed += 1
+            if len(errors) < 10:
+                errors.append(f"{operation} {key}: {str(e)}")
+            issued += 1
+            continue
+        latencies[operation].append((time.perf_counter() - started) * 1000)
+        issued += 1
+
+        if operation != 'overwrite':
+            # Move the key to the other list; swap-remove keeps this O(1)
+            pool[position] = pool[-1]
+            pool.pop()
+            (absent if operation == 'delete' else present).append(key)
+        if operation == 'delete':
+            del sizes[key]
+        else:
+            sizes[key] = size
+
+    return {'sizes': sizes, 'issued': issued, 'failed': failed, 'errors': errors, 'latencies': latencies}
+
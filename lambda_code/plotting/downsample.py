@@ -0,0 +1,87 @@
+"""
+Downsampling for plotted time series.
+
+Methods take the series as separate x and y columns and return the indices
+of the points to keep, so columnar data never has to be expanded into
+tuples. Both methods keep the first and last point and return at most
+`threshold` indices in timestamp order.
+"""
+
+from typing import Callable, Dict, List, Sequence
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Largest-Triangle-Three-Buckets: keeps the visually significant points."""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    sampled = [0]
+    # Interior points are split into threshold - 2 buckets
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+
+        # Average of the next bucket is the third triangle vertex
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            avg_x, avg_y = xs[n - 1], ys[n - 1]
+        else:
+            span = next_end - next_start
+            avg_x = sum(xs[next_start:next_end]) / span
+            avg_y = sum(ys[next_start:next_end]) / span
+
+        ax, ay = xs[a], ys[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(best)
+        a = best
+
+    sampled.append(n - 1)
+    return sampled
+
+
+def min_max(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Min/max per time bucket: preserves every spike, as a per-pixel envelope would."""
+    n = len(xs)
+    if threshold >= n or threshold < 4:
+        return list(range(n))
+
+    # Two points per bucket, plus the pinned first and last points
+    buckets = (threshold - 2) // 2
+    t0 = xs[0]
+    span = (xs[-1] - t0) or 1
+
+    sampled = [0]
+    current = -1
+    lo = hi = None
+    for j in range(1, n - 1):
+        b = min(int((xs[j] - t0) * buckets / span), buckets - 1)
+        if b != current:
+            if lo is not None:
+                sampled.extend(sorted({lo, hi}))
+            current, lo, hi = b, j, j
+        else:
+            if ys[j] < ys[lo]:
+                lo = j
+            if ys[j] > ys[hi]:
+                hi = j
+    if lo is not None:
+        sampled.extend(sorted({lo, hi}))
+    sampled.append(n - 1)
+    return sampled
+
+
+METHODS: Dict[str, Callable[[Sequence[float], Sequence[float], int], List[int]]] = {
+    'lttb': lttb,
+    'minmax': min_max,
+    'none': lambda xs, ys, threshold: list(range(len(xs))),
+}
@@ -1,24 +1,38 @@
 #!/usr/bin/env python3
 """
 Plotting Lambda Function
-Generates matplotlib plots from DynamoDB data, exposed via API Gateway.
+Generates plots from DynamoDB data, exposed via API Gateway.
 """
 
-import io
-import json
-import os
 import time
+
+# Taken before the remaining imports so STARTUP_TIMING can report module load cost
+_MODULE_LOAD_STARTED = time.perf_counter()
+
+import base64  # noqa: E402
+import binascii  # noqa: E402
+import csv  # noqa: E402
+import gzip  # noqa: E402
+import hashlib  # noqa: E402
+import io  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import shutil  # noqa: E402
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import boto3
 from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
 
-# Configure matplotlib for headless environments
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt  # noqa: E402
+from clients import client, resource
+from downsample import METHODS as DOWNSAMPLE_METHODS
+from instrumentation import metrics
+from profiling import profiler
+from renderers import Chart, HLine, Line, Renderer, build_registry
+from series import Series
 
 
 @dataclass
@@ -27,10 +41,130 @@ class Config:
     table_name: str = 'S3-object-size-history'
     window_seconds: int = 10
     plot_key: str = 'plot'
+    renderer: str = 'matplotlib'
+    max_points: int = 1000
+    downsample: str = 'lttb'
+    tier: str = 'auto'
+
+
+# Report per-phase startup timings in the response and logs when set to '1'
+STARTUP_TIMING = os.environ.get('STARTUP_TIMING', '0') == '1'
+# Font cache pre-built into the layer by scripts/build_plotting_layer.sh
+MPL_CACHE_SEED_DIR = os.environ.get('MPL_CACHE_SEED_DIR', '/opt/python/mplconfig')
+MPL_CONFIG_DIR = '/tmp/mplconfig'
+
+# Created on first use so that requests failing validation never pay for them
+_s3_client = None
+_ddb = None
+_ddb_client = None
+_plt = None
+
+_startup_phases: Dict[str, float] = {}
+_cold_start = True
+
+# Partition-key suffix of the per-bucket stats item maintained by size tracking
+STATS_KEY_SUFFIX = '#stats'
+
+# Prefix snapshot partition '<bucket>#prefixes' written by size tracking
+PREFIX_KEY_SUFFIX = '#prefixes'
+
+# Rollup partitions '<bucket>#rollup#<tier>' maintained by size tracking
+ROLLUP_KEY_INFIX = '#rollup#'
+ROLLUP_TIER_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+ROLLUP_TIERS = [t for t in os.environ.get('ROLLUP_TIERS', 'minute,hour,day').split(',') if t]
+# 'auto' picks the coarsest tier that still yields this many points over the window
+ROLLUP_MIN_POINTS = int(os.environ.get('ROLLUP_MIN_POINTS', '200'))
+# (table, partition) -> sort key of the partition's first item, for _choose_tier
+_partition_starts: Dict[Tuple[str, str], float] = {}
+
+# Bump whenever _generate_plot output changes so stale cached renders are not reused
+RENDER_VERSION = '2'
+# Point markers are dropped above this many points; they only add clutter and render time
+MARKER_LIMIT = 200
+RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', '16'))
+
+# fingerprint -> image bytes; module scope so it survives warm invocations
+_render_cache: 'OrderedDict[str, bytes]' = OrderedDict()
+
+# Runs the historical-high read alongside the window query; threads start lazily
+_read_pool = ThreadPoolExecutor(max_workers=2)
+
+# /dashboard reads buckets on a bounded pool and answers with whatever has
+# arrived once the time budget (kept under API Gateway's 29 s limit) runs out
+DASHBOARD_CONCURRENCY = int(os.environ.get('DASHBOARD_CONCURRENCY', '8'))
+DASHBOARD_BUDGET_SECONDS = float(os.environ.get('DASHBOARD_BUDGET_SECONDS', '20'))
+DASHBOARD_MAX_BUCKETS = int(os.environ.get('DASHBOARD_MAX_BUCKETS', '100'))
+DASHBOARD_KEY = 'dashboard'
+# matplotlib's default cycle, so the backends agree on bucket colors
+LINE_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+               '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+_dashboard_pool = ThreadPoolExecutor(max_workers=DASHBOARD_CONCURRENCY)
+
+# /series page sizes; API Gateway compresses larger responses itself
+SERIES_PAGE_SIZE = int(os.environ.get('SERIES_PAGE_SIZE', '1000'))
+SERIES_MAX_PAGE_SIZE = 10000
+
+
+def _record_phase(name: str, started: float) -> None:
+    _startup_phases[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def _s3():
+    global _s3_client
+    if _s3_client is None:
+        started = time.perf_counter()
+        _s3_client = client('s3')
+        _record_phase('s3_client_init_ms', started)
+    return _s3_client
+
+
+def _dynamodb():
+    global _ddb
+    if _ddb is None:
+        started = time.perf_counter()
+        _ddb = resource('dynamodb')
+        _record_phase('dynamodb_init_ms', started)
+    return _ddb
+
+
+def _dynamodb_client():
+    """Low-level client for the /plot reads; unlike resources, clients are thread-safe."""
+    global _ddb_client
+    if _ddb_client is None:
+        started = time.perf_counter()
+        # Shared by the read and dashboard pools and the handler thread
+        _ddb_client = client('dynamodb', max_pool_connections=DASHBOARD_CONCURRENCY + 3)
+        _record_phase('dynamodb_client_init_ms', started)
+    return _ddb_client
+
+
+def _pyplot():
+    """Import matplotlib on first render, configured for headless use."""
+    global _plt
+    if _plt is None:
+        started = time.perf_counter()
+        if 'MPLCONFIGDIR' not in os.environ:
+            _seed_matplotlib_cache()
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        _plt = plt
+        _record_phase('matplotlib_import_ms', started)
+    return _plt
+
+
+def _seed_matplotlib_cache() -> None:
+    """Copy the layer's pre-built font cache to a writable config dir.
+
+    matplotlib ignores a read-only MPLCONFIGDIR, so pointing it at /opt
+    directly would rebuild the font list on every cold start.
+    """
+    if os.path.isdir(MPL_CACHE_SEED_DIR) and not os.path.isdir(MPL_CONFIG_DIR):
+        shutil.copytree(MPL_CACHE_SEED_DIR, MPL_CONFIG_DIR)
+    os.environ['MPLCONFIGDIR'] = MPL_CONFIG_DIR
 
 
-s3_client = boto3.client('s3')
-ddb = boto3.resource('dynamodb')
+RENDERERS: Dict[str, Renderer] = build_registry(_pyplot)
 
 
 def _to_int(n: Any) -> int:
@@ -39,8 +173,22 @@ def _to_int(n: Any) -> int:
     return int(n)
 
 
-def _get_config(event: Dict[str, Any]) -> Config:
-    """Get configuration from environment variables and query parameters."""
+def _to_millis(n: Any) -> int:
+    """History sort keys are integer epoch seconds or, with TIMESTAMP_PRECISION
+    set on the size tracker, fractional epoch seconds; both map to epoch ms."""
+    text = str(n)
+    if text.isdigit():
+        return int(text) * 1000
+    return int(Decimal(text).scaleb(3))
+
+
+def _get_config(event: Dict[str, Any], default_tier: str = 'auto',
+                default_downsample: Optional[str] = None) -> Config:
+    """Get configuration from environment variables and query parameters.
+
+    The defaults apply when the query string does not set tier or
+    downsample; without default_downsample, env DOWNSAMPLE does.
+    """
     qs = (event or {}).get('queryStringParameters') or {}
     
     # Get bucket name from query param or environment variable
@@ -58,121 +206,697 @@ def _get_config(event: Dict[str, Any]) -> Config:
     # Get table name from environment variable
     table = os.environ.get('TABLE_NAME', 'S3-object-size-history')
     
-    return Config(bucket_name=bucket, table_name=table, window_seconds=window)
+    # Get renderer backend from query param or environment variable
+    renderer = qs.get('renderer') or os.environ.get('RENDERER', 'matplotlib')
+    if renderer not in RENDERERS:
+        raise ValueError(f"Unknown renderer '{renderer}'. Choose one of: {', '.join(sorted(RENDERERS))}")
+    
+    # Get downsampling method and target point count
+    downsample = qs.get('downsample') or default_downsample or os.environ.get('DOWNSAMPLE', 'lttb')
+    if downsample not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsample method '{downsample}'. "
+                         f"Choose one of: {', '.join(sorted(DOWNSAMPLE_METHODS))}")
+    max_points_str = qs.get('points') or os.environ.get('MAX_POINTS', '1000')
+    try:
+        max_points = int(max_points_str)
+    except Exception:
+        max_points = 1000
+    
+    # Get resolution tier: 'auto', 'raw' or a rollup tier
+    tier = qs.get('tier') or default_tier
+    if tier not in ('auto', 'raw') and tier not in ROLLUP_TIERS:
+        raise ValueError(f"Unknown tier '{tier}'. Choose one of: auto, raw, {', '.join(ROLLUP_TIERS)}")
+    
+    return Config(bucket_name=bucket, table_name=table, window_seconds=window, renderer=renderer,
+                  max_points=max_points, downsample=downsample, tier=tier)
 
 
-def _query_last_window(table, bucket: str, now_epoch: int, window_seconds: int) -> List[Dict[str, Any]]:
-    """Query DynamoDB for items in the last window."""
-    since = now_epoch - window_seconds
-    items: List[Dict[str, Any]] = []
-    kwargs = {
-        'KeyConditionExpression': Key('bucket_name').eq(bucket) & Key('timestamp').gte(since),
-        'ScanIndexForward': True,
-    }
-    while True:
-        resp = table.query(**kwargs)
-        items.extend(resp.get('Items', []))
-        lek = resp.get('LastEvaluatedKey')
-        if not lek:
+def _partition_start(table_name: str, partition: str) -> Optional[float]:
+    """Sort key of a partition's first item in seconds, or None if it is empty.
+
+    Found starts are cached: a partition only ever grows at the end, and a
+    backfill moving its start earlier only makes the cached value cautious.
+    """
+    cache_key = (table_name, partition)
+    if cache_key in _partition_starts:
+        return _partition_starts[cache_key]
+    resp = _dynamodb_client().query(
+        TableName=table_name,
+        KeyConditionExpression='bucket_name = :pk',
+        ExpressionAttributeNames={'#ts': 'timestamp'},
+        ExpressionAttributeValues={':pk': {'S': partition}},
+        ProjectionExpression='#ts',
+        ScanIndexForward=True,
+        Limit=1,
+    )
+    items = resp.get('Items', [])
+    if not items:
+        return None
+    _partition_starts[cache_key] = float(items[0]['timestamp']['N'])
+    return _partition_starts[cache_key]
+
+
+def _choose_tier(table_name: str, bucket: str, window_seconds: int, requested: str, now_epoch: int) -> str:
+    """Resolve 'auto' to the coarsest rollup tier with enough resolution, else 'raw'.
+
+    A tier is only used if its rollups reach back as far as the raw history
+    does within the window; rollups start when size tracking began writing
+    them, and older history is only in the raw rows until
+    scripts/backfill_rollups.py has run.
+    """
+    if requested != 'auto':
+        return requested
+    candidates = [t for t in sorted(ROLLUP_TIERS, key=lambda t: ROLLUP_TIER_SECONDS[t], reverse=True)
+                  if window_seconds // ROLLUP_TIER_SECONDS[t] >= ROLLUP_MIN_POINTS]
+    if not candidates:
+        return 'raw'
+    history_start = _partition_start(table_name, bucket)
+    if history_start is None:
+        return 'raw'
+    needed_from = max(now_epoch - window_seconds, int(history_start))
+    for tier in candidates:
+        rollup_start = _partition_start(table_name, bucket + ROLLUP_KEY_INFIX + tier)
+        tier_seconds = ROLLUP_TIER_SECONDS[tier]
+        if rollup_start is not None and rollup_start <= needed_from // tier_seconds * tier_seconds:
+            return tier
+        metrics.count('rollup_tier_skipped')
+    return 'raw'
+
+
+def _query_last_window(table_name: str, bucket: str, now_epoch: int,
+                       window_seconds: int, deadline: Optional[float] = None) -> Series:
+    """Read (timestamp, total_size) of the history rows in the last window.
+
+    The bound is in whole seconds, which compares correctly against both
+    integer and fractional (high-resolution) sort keys.
+    """
+    return _read_series(table_name, bucket, now_epoch - window_seconds, 'total_size', deadline=deadline)
+
+
+def _query_rollup_window(table_name: str, bucket: str, tier: str, now_epoch: int,
+                         window_seconds: int, deadline: Optional[float] = None) -> Series:
+    """Read (timestamp, last_size) of one rollup tier covering the last window."""
+    tier_seconds = ROLLUP_TIER_SECONDS[tier]
+    # Include the partial rollup bucket the window starts in
+    since = (now_epoch - window_seconds) // tier_seconds * tier_seconds
+    return _read_series(table_name, bucket + ROLLUP_KEY_INFIX + tier, since, 'last_size', deadline=deadline)
+
+
+def _iter_pages(table_name: str, partition: str, since: Any, projection: str,
+                until: Any = None, deadline: Optional[float] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Yield raw item pages of a partition from `since` (to `until`, inclusive), fetching only `projection`.
+
+    With `deadline` (a time.perf_counter() value), TimeoutError is raised
+    instead of fetching another page once it has passed.
+    """
+    values = {':pk': {'S': partition}, ':since': {'N': str(since)}}
+    condition = 'bucket_name = :pk AND #ts >= :since'
+    if until is not None:
+        condition = 'bucket_name = :pk AND #ts BETWEEN :since AND :until'
+        values[':until'] = {'N': str(until)}
+    paginator = _dynamodb_client().get_paginator('query')
+    pages = paginator.paginate(
+        TableName=table_name,
+        KeyConditionExpression=condition,
+        # 'timestamp' is a DynamoDB reserved word
+        ExpressionAttributeNames={'#ts': 'timestamp'},
+        ExpressionAttributeValues=values,
+        ProjectionExpression=projection,
+        ScanIndexForward=True,
+    )
+    for page in pages:
+        items = page.get('Items', [])
+        metrics.count('pages_read')
+        metrics.count('items_read', len(items))
+        yield items
+        if deadline is not None and time.perf_counter() >= deadline:
+            raise TimeoutError(f"Stopped reading {partition} at the deadline")
+
+
+def _read_series(table_name: str, partition: str, since: Any, size_attr: str,
+                 until: Any = None, limit: Optional[int] = None, deadline: Optional[float] = None) -> Series:
+    """Append pages to a columnar series as they arrive.
+
+    Raw attribute values are parsed directly, so no page is ever held as
+    dicts of Decimals and only the two projected attributes are read.
+    With `limit`, no further pages are fetched once that many points are in.
+    """
+    series = Series()
+    for items in _iter_pages(table_name, partition, since, '#ts, ' + size_attr, until, deadline):
+        for it in items:
+            size = it.get(size_attr)
+            series.append(_to_millis(it['timestamp']['N']), int(size['N']) if size else 0)
+        if limit is not None and len(series) >= limit:
             break
-        kwargs['ExclusiveStartKey'] = lek
-    return items
+    return series
 
 
-def _query_all_for_max(table, bucket: str) -> int:
-    """Query entire partition for bucket to compute historical max of total_size."""
+@metrics.timed('query_all_for_max')
+def _query_all_for_max(table_name: str, bucket: str, deadline: Optional[float] = None) -> int:
+    """Query entire partition for bucket to compute historical max of total_size.
+
+    gte(0) covers integer and fractional sort keys alike.
+    """
     max_size = 0
-    kwargs = {
-        'KeyConditionExpression': Key('bucket_name').eq(bucket) & Key('timestamp').gte(0),
-        'ScanIndexForward': True,
-    }
-    while True:
-        resp = table.query(**kwargs)
-        for it in resp.get('Items', []):
-            sz = _to_int(it.get('total_size', 0))
-            if sz > max_size:
-                max_size = sz
-        lek = resp.get('LastEvaluatedKey')
-        if not lek:
-            break
-        kwargs['ExclusiveStartKey'] = lek
+    for items in _iter_pages(table_name, bucket, 0, 'total_size', deadline=deadline):
+        for it in items:
+            if 'total_size' in it:
+                max_size = max(max_size, int(it['total_size']['N']))
     return max_size
 
 
-def _generate_plot(points: List[Tuple[int, int]], historical_high: int) -> bytes:
-    """Generate PNG bytes with matplotlib.
-    points: list of (timestamp, size)
+@metrics.timed('get_historical_high')
+def _get_historical_high(table_name: str, bucket: str, deadline: Optional[float] = None) -> int:
+    """Read the materialized historical high; fall back to a partition scan for tables not yet backfilled."""
+    resp = _dynamodb_client().get_item(
+        TableName=table_name,
+        Key={'bucket_name': {'S': bucket + STATS_KEY_SUFFIX}, 'timestamp': {'N': '0'}},
+        ProjectionExpression='historical_high',
+    )
+    item = resp.get('Item')
+    if item and 'historical_high' in item:
+        return int(item['historical_high']['N'])
+    print(f"No stats item for {bucket}; scanning history (run scripts/backfill_bucket_stats.py)")
+    return _query_all_for_max(table_name, bucket, deadline)
+
+
+@metrics.timed('generate_plot')
+def _generate_plot(points: Series, historical_high: int, renderer: Renderer) -> bytes:
+    """Generate image bytes with the selected renderer.
+    points: series of (epoch ms, size), passed to the renderer as-is
     """
-    # Prepare data
-    xs = [p[0] for p in points]
-    ys = [p[1] for p in points]
+    chart = Chart(
+        title='Bucket size (last window) with historical high',
+        x_label='Seconds (relative)',
+        y_label='Total size (bytes)',
+    )
+    if len(points):
+        # Normalize X to human-readable seconds offset from first point
+        chart.lines.append(Line('Last window size', points.ts, points.values,
+                                markers=len(points) <= MARKER_LIMIT,
+                                x_origin=points.first_ts(), x_scale=0.001))
 
-    fig, ax = plt.subplots(figsize=(7, 3.5), dpi=150)
+    # Historical high line
+    chart.hlines.append(HLine('Historical high', historical_high))
 
-    if xs:
-        # Normalize X to human-readable seconds offset from first point
-        x0 = xs[0]
-        x_secs = [x - x0 for x in xs]
-        ax.plot(x_secs, ys, marker='o', linewidth=1.5, color='#1f77b4', label='Last window size')
+    return renderer.render(chart)
+
+
+def _fingerprint(cfg: Config, tier: str, points: Series, historical_high: int) -> str:
+    """Identify the rendered output by the data and options it depends on.
+
+    Every point is hashed: rollup items are updated in place, and at
+    whole-second precision a later write in the same second replaces the
+    last history row, so neither the timestamps nor the point count alone
+    identify the window's contents. The arrays are already in memory, so
+    hashing them costs next to nothing.
+    """
+    parts = [
+        RENDER_VERSION,
+        tier,
+        cfg.bucket_name,
+        cfg.window_seconds,
+        cfg.renderer,
+        cfg.downsample,
+        cfg.max_points,
+        len(points),
+        historical_high,
+    ]
+    digest = hashlib.sha256(json.dumps(parts).encode('utf-8'))
+    digest.update(points.ts.tobytes())
+    digest.update(points.values.tobytes())
+    return digest.hexdigest()
+
+
+def _cache_get(fingerprint: str) -> Optional[bytes]:
+    image_bytes = _render_cache.get(fingerprint)
+    if image_bytes is not None:
+        _render_cache.move_to_end(fingerprint)
+    return image_bytes
+
+
+def _cache_put(fingerprint: str, image_bytes: bytes) -> None:
+    _render_cache[fingerprint] = image_bytes
+    _render_cache.move_to_end(fingerprint)
+    while len(_render_cache) > RENDER_CACHE_SIZE:
+        _render_cache.popitem(last=False)
+
+
+def _uploaded_fingerprint(bucket: str, key: str) -> Optional[str]:
+    """Return the fingerprint stored on the current S3 plot object, if any."""
+    try:
+        resp = _s3().head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return resp.get('Metadata', {}).get('fingerprint')
+
+
+def _startup_report() -> Dict[str, Any]:
+    """Summarize init phases; each phase is only recorded on the invocation that paid for it."""
+    global _cold_start
+    report = dict(_startup_phases, cold_start=_cold_start)
+    _cold_start = False
+    _startup_phases.clear()
+    print(json.dumps({'startup': report}))
+    return report
+
+
+def _load_prefix_snapshot(item: Dict[str, Any]) -> Dict[str, List[int]]:
+    data = item['data']
+    raw = data.value if hasattr(data, 'value') else data
+    return json.loads(gzip.decompress(bytes(raw)).decode('utf-8'))
+
+
+def _query_prefix_snapshot(table, bucket: str, before: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Latest prefix snapshot, or the latest one taken at or before `before`."""
+    condition = Key('bucket_name').eq(bucket + PREFIX_KEY_SUFFIX)
+    if before is not None:
+        condition = condition & Key('timestamp').lte(before)
+    resp = table.query(KeyConditionExpression=condition, ScanIndexForward=False, Limit=1)
+    items = resp.get('Items', [])
+    return items[0] if items else None
+
+
+def _oldest_prefix_snapshot(table, bucket: str) -> Optional[Dict[str, Any]]:
+    resp = table.query(
+        KeyConditionExpression=Key('bucket_name').eq(bucket + PREFIX_KEY_SUFFIX),
+        ScanIndexForward=True,
+        Limit=1,
+    )
+    items = resp.get('Items', [])
+    return items[0] if items else None
+
+
+def _prefix_report(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Top-N prefixes by size and by growth rate over ?window= seconds (default one day)."""
+    qs = (event or {}).get('queryStringParameters') or {}
+    bucket = qs.get('bucket') or os.environ.get('BUCKET_NAME')
+    if not bucket:
+        raise ValueError("Bucket name not provided. Set env BUCKET_NAME or pass ?bucket=")
+    try:
+        top_n = int(qs.get('top', '10'))
+        window = int(qs.get('window', '86400'))
+    except ValueError:
+        raise ValueError("top and window must be integers")
+
+    table = _dynamodb().Table(os.environ.get('TABLE_NAME', 'S3-object-size-history'))
+    latest = _query_prefix_snapshot(table, bucket)
+    if latest is None:
+        raise ValueError(f"No prefix snapshots for bucket {bucket}. Enable PREFIX_DEPTH on the size-tracking lambda")
+
+    latest_ts = _to_int(latest['timestamp'])
+    current = _load_prefix_snapshot(latest)
+    by_size = sorted(current.items(), key=lambda kv: (-kv[1][0], kv[0]))[:top_n]
+
+    # Baseline: last snapshot before the window, else the oldest one we have
+    baseline = _query_prefix_snapshot(table, bucket, before=latest_ts - window)
+    if baseline is None:
+        baseline = _oldest_prefix_snapshot(table, bucket)
+    growth: List[Dict[str, Any]] = []
+    baseline_ts = _to_int(baseline['timestamp']) if baseline else latest_ts
+    if baseline_ts < latest_ts:
+        previous = _load_prefix_snapshot(baseline)
+        elapsed = latest_ts - baseline_ts
+        for prefix, (size, _count) in current.items():
+            if prefix in previous:
+                before_size = previous[prefix][0]
+            elif not baseline.get('truncated'):
+                before_size = 0
+            else:
+                # Unknown: the prefix may have been folded into 'other'
+                continue
+            growth.append({
+                'prefix': prefix,
+                'size': size,
+                'growth_bytes': size - before_size,
+                'bytes_per_second': round((size - before_size) / elapsed, 3),
+            })
+        growth.sort(key=lambda g: (-g['growth_bytes'], g['prefix']))
+
+    return {
+        'bucket': bucket,
+        'snapshot_timestamp': latest_ts,
+        'baseline_timestamp': baseline_ts if baseline_ts < latest_ts else None,
+        'depth': _to_int(latest['depth']),
+        'truncated': bool(latest.get('truncated')),
+        'other_size': _to_int(latest.get('other_size', 0)),
+        'top_by_size': [{'prefix': p, 'size': v[0], 'object_count': v[1]} for p, v in by_size],
+        'top_by_growth': growth[:top_n],
+    }
+
+
+def _read_bucket(table_name: str, bucket: str, requested_tier: str, now_epoch: int,
+                 window_seconds: int, deadline: float) -> Tuple[Series, int, str]:
+    """Window series, historical high and resolved tier of one bucket, for the dashboard workers.
+
+    Paging stops at `deadline`, so a read still running when the dashboard
+    answers does not keep a worker and read capacity busy.
+    """
+    tier = _choose_tier(table_name, bucket, window_seconds, requested_tier, now_epoch)
+    if tier == 'raw':
+        series = _query_last_window(table_name, bucket, now_epoch, window_seconds, deadline)
     else:
-        # No data, draw empty axes
-        ax.plot([], [], label='No points in window')
+        series = _query_rollup_window(table_name, bucket, tier, now_epoch, window_seconds, deadline)
+    series.sort()
+    return series, _get_historical_high(table_name, bucket, deadline), tier
 
-    # Historical high line
-    ax.axhline(y=historical_high, color='#d62728', linestyle='--', linewidth=1.2, label='Historical high')
 
-    ax.set_xlabel('Seconds (relative)')
-    ax.set_ylabel('Total size (bytes)')
-    ax.set_title('Bucket size (last window) with historical high')
-    ax.grid(True, linestyle=':', linewidth=0.5, alpha=0.6)
-    ax.legend(loc='best', fontsize=8)
+def _summarize(bucket: str, series: Series, historical_high: int) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {
+        'bucket': bucket,
+        'status': 'ok',
+        'num_points': len(series),
+        'historical_high': historical_high,
+    }
+    if len(series):
+        summary.update(
+            last_size=series.values[-1],
+            last_timestamp=series.last_ts() / 1000,
+            min_size=min(series.values),
+            max_size=max(series.values),
+            change=series.values[-1] - series.values[0],
+        )
+    return summary
 
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format='png')
-    plt.close(fig)
-    buf.seek(0)
-    return buf.read()
 
+def _dashboard(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Summaries, and optionally one composite chart, for many buckets.
 
+    ?buckets=a,b,c (default: env DASHBOARD_BUCKETS) are read concurrently.
+    Buckets not read within DASHBOARD_BUDGET_SECONDS are reported with
+    status 'timeout' instead of failing the request. ?format=image also
+    renders every bucket as one line of a chart uploaded to 'dashboard'
+    in BUCKET_NAME; window, tier, renderer and downsampling options are
+    the same as for /plot.
+    """
+    qs = (event or {}).get('queryStringParameters') or {}
+    buckets = list(dict.fromkeys(
+        b.strip() for b in (qs.get('buckets') or os.environ.get('DASHBOARD_BUCKETS', '')).split(',') if b.strip()
+    ))
+    if not buckets:
+        raise ValueError("No buckets given. Pass ?buckets=a,b,c or set env DASHBOARD_BUCKETS")
+    if len(buckets) > DASHBOARD_MAX_BUCKETS:
+        raise ValueError(f"At most {DASHBOARD_MAX_BUCKETS} buckets per request")
+    output = qs.get('format') or 'json'
+    if output not in ('json', 'image'):
+        raise ValueError("format must be 'json' or 'image'")
+
+    # BUCKET_NAME is only the upload target here
+    cfg = _get_config(event)
+    now_epoch = int(time.time())
+    started = time.perf_counter()
+    deadline = started + DASHBOARD_BUDGET_SECONDS
+
+    _dynamodb_client()
+    futures = {
+        bucket: _dashboard_pool.submit(_read_bucket, cfg.table_name, bucket, cfg.tier, now_epoch,
+                                       cfg.window_seconds, deadline)
+        for bucket in buckets
+    }
+    done, pending = wait(futures.values(), timeout=DASHBOARD_BUDGET_SECONDS)
+    for future in pending:
+        # Queued reads are dropped; running ones stop after their current page
+        future.cancel()
+
+    summaries: List[Dict[str, Any]] = []
+    series_by_bucket: Dict[str, Series] = {}
+    for bucket, future in futures.items():
+        if future not in done:
+            summaries.append({'bucket': bucket, 'status': 'timeout'})
+            continue
+        try:
+            series, historical_high, tier = future.result()
+        except Exception as e:
+            summaries.append({'bucket': bucket, 'status': 'error', 'error': str(e)})
+            continue
+        summaries.append(dict(_summarize(bucket, series, historical_high), tier=tier))
+        series_by_bucket[bucket] = series
+
+    body: Dict[str, Any] = {
+        'window_seconds': cfg.window_seconds,
+        'tier': cfg.tier,
+        'complete': not pending,
+        'buckets': summaries,
+    }
+
+    if output == 'image':
+        chart = Chart(
+            title='Bucket sizes (last window)',
+            x_label='Seconds (relative)',
+            y_label='Total size (bytes)',
+        )
+        # A shared origin keeps the lines aligned in time
+        origin = min((s.first_ts() for s in series_by_bucket.values() if len(s)), default=0)
+        for i, (bucket, series) in enumerate(series_by_bucket.items()):
+            if not len(series):
+                continue
+            plotted = series.take(DOWNSAMPLE_METHODS[cfg.downsample](series.ts, series.values, cfg.max_points))
+            chart.lines.append(Line(bucket, plotted.ts, plotted.values,
+                                    color=LINE_COLORS[i % len(LINE_COLORS)],
+                                    markers=len(plotted) <= MARKER_LIMIT // max(1, len(series_by_bucket)),
+                                    x_origin=origin, x_scale=0.001))
+        renderer = RENDERERS[cfg.renderer]
+        with metrics.span('generate_plot'):
+            image_bytes = renderer.render(chart)
+        with metrics.span('s3_upload'):
+            _s3().put_object(
+                Bucket=cfg.bucket_name,
+                Key=DASHBOARD_KEY,
+                Body=image_bytes,
+                ContentType=renderer.content_type,
+                CacheControl='no-cache',
+            )
+        metrics.count('bytes_written', len(image_bytes))
+        body.update(s3_key=DASHBOARD_KEY, renderer=renderer.name, content_type=renderer.content_type)
+
+    body['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return body
+
+
+def _ms_to_key(ms: int) -> str:
+    """Epoch milliseconds as a sort key value in seconds, e.g. '1700000000.123'."""
+    return str(Decimal(ms).scaleb(-3))
+
+
+def _encode_cursor(state: Dict[str, Any]) -> str:
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict) or any(f not in state for f in ('tier', 'since', 'until', 'after')):
+        raise ValueError("Invalid cursor")
+    return state
+
+
+def _series_page(event: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Tuple[int, int]]]:
+    """One page of a bucket's windowed points, without rendering anything.
+
+    Points are raw rows unless ?tier= or ?downsample= ask otherwise; env
+    DOWNSAMPLE, which shapes /plot, does not apply. The first request fixes
+    the window to [now - window, now]; the cursor returned with each page
+    carries that range and the last timestamp sent (millisecond
+    resolution), so later pages neither shift with new writes nor repeat
+    points, and each page reads only its own rows. A downsampled series is
+    at most ?points= long and comes back whole in one page, with no cursor.
+
+    Returns:
+        Tuple of (response metadata, page of (epoch ms, size) points)
+    """
+    qs = (event or {}).get('queryStringParameters') or {}
+    cfg = _get_config(event, default_tier='raw', default_downsample='none')
+    try:
+        limit = min(max(int(qs.get('limit') or SERIES_PAGE_SIZE), 1), SERIES_MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if cfg.downsample != 'none':
+        if qs.get('cursor'):
+            raise ValueError("cursor only applies to downsample=none")
+        if cfg.max_points > SERIES_MAX_PAGE_SIZE:
+            raise ValueError(f"points must be at most {SERIES_MAX_PAGE_SIZE} when downsampling")
+        limit = SERIES_MAX_PAGE_SIZE
+
+    if qs.get('cursor'):
+        state = _decode_cursor(qs['cursor'])
+    else:
+        until = int(time.time() * 1000)
+        tier = _choose_tier(cfg.table_name, cfg.bucket_name, cfg.window_seconds, cfg.tier, until // 1000)
+        since = until - cfg.window_seconds * 1000
+        if tier != 'raw':
+            # Include the partial rollup bucket the window starts in
+            tier_ms = ROLLUP_TIER_SECONDS[tier] * 1000
+            since = since // tier_ms * tier_ms
+        state = {'tier': tier, 'since': since, 'until': until, 'after': None}
+    tier = state['tier']
+    if tier != 'raw' and tier not in ROLLUP_TIERS:
+        raise ValueError("Invalid cursor")
+    partition = cfg.bucket_name if tier == 'raw' else cfg.bucket_name + ROLLUP_KEY_INFIX + tier
+    size_attr = 'total_size' if tier == 'raw' else 'last_size'
+
+    _dynamodb_client()
+    high_future = _read_pool.submit(_get_historical_high, cfg.table_name, cfg.bucket_name)
+
+    after = state['after']
+    if cfg.downsample == 'none':
+        # The row at `after` itself comes back too, and one extra shows whether more follow
+        start = after if after is not None else state['since']
+        series = _read_series(cfg.table_name, partition, _ms_to_key(start), size_attr,
+                              until=_ms_to_key(state['until']), limit=limit + 2)
+        series.sort()
+    else:
+        # The window is read once; the result fits the page
+        series = _read_series(cfg.table_name, partition, _ms_to_key(state['since']), size_attr,
+                              until=_ms_to_key(state['until']))
+        series.sort()
+        series = series.take(DOWNSAMPLE_METHODS[cfg.downsample](series.ts, series.values, cfg.max_points))
+
+    remaining = [(ts, size) for ts, size in zip(series.ts, series.values) if after is None or ts > after]
+    page = remaining[:limit]
+    next_cursor = None
+    if len(remaining) > limit:
+        next_cursor = _encode_cursor(dict(state, after=page[-1][0]))
+
+    meta = {
+        'bucket': cfg.bucket_name,
+        'window_seconds': cfg.window_seconds,
+        'tier': tier,
+        'downsample': cfg.downsample,
+        'historical_high': high_future.result(),
+        'num_points': len(page),
+        'next_cursor': next_cursor,
+    }
+    return meta, page
+
+
+def _series_response(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Serve /series as JSON (default) or CSV (?format=csv)."""
+    qs = (event or {}).get('queryStringParameters') or {}
+    output = qs.get('format') or 'json'
+    if output not in ('json', 'csv'):
+        raise ValueError("format must be 'json' or 'csv'")
+
+    meta, page = _series_page(event)
+    headers = {}
+    if output == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        writer.writerow(['timestamp', 'size'])
+        writer.writerows((ts / 1000, size) for ts, size in page)
+        body = buf.getvalue()
+        headers['Content-Type'] = 'text/csv'
+        # Metadata travels in headers so the body stays plain CSV
+        headers['X-Historical-High'] = str(meta['historical_high'])
+        if meta['next_cursor']:
+            headers['X-Next-Cursor'] = meta['next_cursor']
+    else:
+        meta['points'] = [[ts / 1000, size] for ts, size in page]
+        body = json.dumps(meta, separators=(',', ':'))
+        headers['Content-Type'] = 'application/json'
+
+    return {'statusCode': 200, 'headers': headers, 'body': body}
+
+
+@metrics.handler('plotting')
+@profiler.sampled
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """Lambda handler for API Gateway requests."""
+    metrics.set_property('route', (event or {}).get('resource') or '/plot')
     try:
+        if (event or {}).get('resource') == '/prefixes':
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps(_prefix_report(event))
+            }
+        if (event or {}).get('resource') == '/series':
+            return _series_response(event)
+        if (event or {}).get('resource') == '/dashboard':
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json'},
+                'body': json.dumps(_dashboard(event))
+            }
+
         cfg = _get_config(event)
-        table = ddb.Table(cfg.table_name)
 
         now_epoch = int(time.time())
 
-        # Query window points and whole-history max (both via Query)
-        window_items = _query_last_window(table, cfg.bucket_name, now_epoch, cfg.window_seconds)
-        # Convert to simple tuples and sort by timestamp
-        points: List[Tuple[int, int]] = []
-        for it in sorted(window_items, key=lambda x: _to_int(x['timestamp'])):
-            ts = _to_int(it['timestamp'])
-            size = _to_int(it.get('total_size', 0))
-            points.append((ts, size))
-
-        historical_high = _query_all_for_max(table, cfg.bucket_name)
-
-        # Generate plot PNG
-        png_bytes = _generate_plot(points, historical_high)
-
-        # Write to S3 as 'plot'
-        s3_client.put_object(
-            Bucket=cfg.bucket_name,
-            Key=cfg.plot_key,
-            Body=png_bytes,
-            ContentType='image/png',
-            CacheControl='no-cache'
-        )
+        # The two reads are independent; create the shared client before
+        # either thread can race to do so
+        _dynamodb_client()
+        high_future = _read_pool.submit(_get_historical_high, cfg.table_name, cfg.bucket_name)
+
+        # Query window points from raw history or the chosen rollup tier
+        tier = _choose_tier(cfg.table_name, cfg.bucket_name, cfg.window_seconds, cfg.tier, now_epoch)
+        with metrics.span('query_window'):
+            if tier == 'raw':
+                points = _query_last_window(cfg.table_name, cfg.bucket_name, now_epoch, cfg.window_seconds)
+            else:
+                points = _query_rollup_window(cfg.table_name, cfg.bucket_name, tier, now_epoch,
+                                              cfg.window_seconds)
+        # Queries return keys in order, so this only sorts if that ever changes
+        points.sort()
+
+        historical_high = high_future.result()
+
+        # Reduce long windows to roughly one point per horizontal pixel
+        plotted = points.take(DOWNSAMPLE_METHODS[cfg.downsample](points.ts, points.values, cfg.max_points))
+
+        # 'hit': S3 already holds this render, skip both render and upload
+        # 'memory': render reused from this container, upload only
+        # 'miss': render and upload
+        renderer = RENDERERS[cfg.renderer]
+        render_ms = None
+        fingerprint = _fingerprint(cfg, tier, points, historical_high)
+        if _uploaded_fingerprint(cfg.bucket_name, cfg.plot_key) == fingerprint:
+            cache_status = 'hit'
+        else:
+            image_bytes = _cache_get(fingerprint)
+            if image_bytes is not None:
+                cache_status = 'memory'
+            else:
+                cache_status = 'miss'
+                # Generate plot image
+                render_started = time.perf_counter()
+                image_bytes = _generate_plot(plotted, historical_high, renderer)
+                render_ms = round((time.perf_counter() - render_started) * 1000, 2)
+                _cache_put(fingerprint, image_bytes)
+
+            # Write to S3 as 'plot'
+            with metrics.span('s3_upload'):
+                _s3().put_object(
+                    Bucket=cfg.bucket_name,
+                    Key=cfg.plot_key,
+                    Body=image_bytes,
+                    ContentType=renderer.content_type,
+                    CacheControl='no-cache',
+                    Metadata={'fingerprint': fingerprint}
+                )
+            metrics.count('bytes_written', len(image_bytes))
 
         body = {
             'bucket': cfg.bucket_name,
             's3_key': cfg.plot_key,
             'window_seconds': cfg.window_seconds,
-            'num_points': len(points),
+            'tier': tier,
+            'raw_points': len(points),
+            'num_points': len(plotted),
+            'downsample': cfg.downsample,
             'historical_high': historical_high,
+            'cache': cache_status,
+            'renderer': renderer.name,
+            'content_type': renderer.content_type,
+            'render_ms': render_ms,
         }
+        metrics.set_property('cache', cache_status)
+        if STARTUP_TIMING:
+            body['startup'] = _startup_report()
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json'},
@@ -186,3 +910,5 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': str(e)})
         }
 
+
+_record_phase('module_import_ms', _MODULE_LOAD_STARTED)
@@ -0,0 +1,58 @@
+"""
+Columnar time series for the plotting path.
+
+A Series keeps timestamps (epoch milliseconds) and values in two int64
+arrays: 16 bytes per point, against well over 100 bytes for a list of
+(float, int) tuples and several hundred for DynamoDB item dicts. It is
+filled directly from query pages and handed to downsampling and renderers
+as-is.
+"""
+
+from array import array
+from typing import Iterable
+
+
+class Series:
+    __slots__ = ('ts', 'values', 'ordered')
+
+    def __init__(self) -> None:
+        self.ts = array('q')
+        self.values = array('q')
+        # Stays True while points arrive in timestamp order, which
+        # ScanIndexForward queries guarantee; sort() is then a no-op
+        self.ordered = True
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def append(self, ts_ms: int, value: int) -> None:
+        if self.ordered and self.ts and ts_ms < self.ts[-1]:
+            self.ordered = False
+        self.ts.append(ts_ms)
+        self.values.append(value)
+
+    def sort(self) -> None:
+        """Order points by timestamp, only if they did not arrive in order."""
+        if self.ordered:
+            return
+        order = sorted(range(len(self.ts)), key=self.ts.__getitem__)
+        self.ts = array('q', (self.ts[i] for i in order))
+        self.values = array('q', (self.values[i] for i in order))
+        self.ordered = True
+
+    def take(self, indices: Iterable[int]) -> 'Series':
+        """New series of the points at `indices` (ascending, e.g. from downsampling)."""
+        indices = list(indices)
+        if len(indices) == len(self.ts):
+            # Every point kept; share the arrays instead of copying them
+            return self
+        taken = Series()
+        taken.ts = array('q', (self.ts[i] for i in indices))
+        taken.values = array('q', (self.values[i] for i in indices))
+        return taken
+
+    def first_ts(self):
+        return self.ts[0] if self.ts else None
+
+    def last_ts(self):
+        return self.ts[-1] if self.ts else None
@@ -0,0 +1,129 @@
+"""
+Shared AWS and HTTP clients (shared layer).
+
+Clients are created once per container and reused by warm invocations, so
+their pooled connections (and TLS sessions) outlive a single request. All
+AWS clients get TCP keepalive and adaptive retries, which back off
+client-side when a service starts throttling, and a connection pool sized
+for the threads that share them:
+
+    from clients import client, http_client, resource
+
+    s3_client = client('s3', max_pool_connections=RECOUNT_CONCURRENCY)
+    table = resource('dynamodb').Table(TABLE_NAME)
+    status, body = http_client.request('GET', PLOTTING_API_URL)
+"""
+
+import socket
+import threading
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import boto3
+from botocore.config import Config
+
+# botocore's own default; smaller pools are never worth a second client
+DEFAULT_POOL_CONNECTIONS = 10
+
+_lock = threading.Lock()
+# service -> (pool size, client or resource)
+_clients: Dict[str, Tuple[int, Any]] = {}
+_resources: Dict[str, Tuple[int, Any]] = {}
+
+
+def client_config(max_pool_connections: int = DEFAULT_POOL_CONNECTIONS) -> Config:
+    """botocore Config with keepalive, adaptive retries and a pool of at least the given size."""
+    return Config(
+        tcp_keepalive=True,
+        retries={'mode': 'adaptive'},
+        max_pool_connections=max(DEFAULT_POOL_CONNECTIONS, max_pool_connections),
+    )
+
+
+def _cached(cache: Dict[str, Tuple[int, Any]], factory, service: str, max_pool_connections: int) -> Any:
+    pool_size = max(DEFAULT_POOL_CONNECTIONS, max_pool_connections)
+    with _lock:
+        cached = cache.get(service)
+        # A pool cannot grow, so a caller needing more connections gets a new client
+        if cached is None or cached[0] < pool_size:
+            cached = (pool_size, factory(service, config=client_config(pool_size)))
+            cache[service] = cached
+        return cached[1]
+
+
+def client(service: str, max_pool_connections: int = DEFAULT_POOL_CONNECTIONS) -> Any:
+    """
+    Cached boto3 client for `service`.
+
+    Clients are thread-safe; pass the number of threads that will use the
+    client at once as `max_pool_connections`.
+    """
+    return _cached(_clients, boto3.client, service, max_pool_connections)
+
+
+def resource(service: str, max_pool_connections: int = DEFAULT_POOL_CONNECTIONS) -> Any:
+    """Cached boto3 resource for `service`; unlike clients, resources are not thread-safe."""
+    return _cached(_resources, boto3.resource, service, max_pool_connections)
+
+
+class HttpClient:
+    """
+    Keep-alive HTTP(S) connections, pooled per host.
+
+    A connection serves one request at a time; idle ones are kept for the
+    next request from any thread. A request on a reused connection that the
+    server has since closed (API Gateway drops idle ones) is retried once on
+    a fresh connection.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str], List[HTTPConnection]] = {}
+
+    def request(self, method: str, url: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None, timeout: float = 30) -> Tuple[int, bytes]:
+        """Send one request; returns (status, body). Connection failures raise OSError or HTTPException."""
+        parsed = urlsplit(url)
+        host = (parsed.scheme, parsed.netloc)
+        path = (parsed.path or '/') + (f"?{parsed.query}" if parsed.query else '')
+        while True:
+            connection, reused = self._checkout(host, timeout)
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (ConnectionError, HTTPException):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(host, connection)
+            return response.status, data
+
+    def _checkout(self, host: Tuple[str, str], timeout: float) -> Tuple[HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(host)
+            if idle:
+                connection = idle.pop()
+                connection.sock.settimeout(timeout)
+                return connection, True
+        scheme, netloc = host
+        connection = (HTTPSConnection if scheme == 'https' else HTTPConnection)(netloc, timeout=timeout)
+        connection.connect()
+        connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        return connection, False
+
+    def _checkin(self, host: Tuple[str, str], connection: HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault(host, []).append(connection)
+
+
+# One per container, like the AWS clients
+http_client = HttpClient()
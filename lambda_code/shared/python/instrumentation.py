@@ -0,0 +1,160 @@
+"""
+Hot-path instrumentation shared by all Lambda functions (deployed as a layer).
+
+Handlers time their phases with spans and bump counters such as pages
+listed, items read and bytes written. When the invocation ends, one
+CloudWatch Embedded Metric Format (EMF) line is printed; CloudWatch Logs
+extracts the metrics from it, so publishing costs no API calls and adds no
+latency. Metrics are dimensioned by function only, to keep cardinality low;
+the request id rides along as a property for log searches.
+
+    from instrumentation import metrics
+
+    @metrics.handler('plotting')
+    def lambda_handler(event, context):
+        with metrics.span('generate_plot'):
+            ...
+        metrics.count('bytes_written', len(body))
+"""
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Set to '0' to stop emitting metric lines
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'S3SizeTracking')
+
+
+def percentiles(samples: List[float]) -> Optional[Dict[str, float]]:
+    """
+    Nearest-rank p50/p90/p99, max and mean of millisecond samples, or None
+    without samples. The driver's load reports and the offline benchmarks
+    both use this, so their figures are comparable.
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)], 3)
+
+    return {
+        'count': len(ordered),
+        'p50': rank(50),
+        'p90': rank(90),
+        'p99': rank(99),
+        'max': round(ordered[-1], 3),
+        'mean': round(sum(ordered) / len(ordered), 3),
+    }
+
+
+class Metrics:
+    """Per-invocation spans and counters, flushed as one EMF line."""
+
+    def __init__(self) -> None:
+        self.service = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+        # True until the first invocation of this container has been flushed
+        self.cold_start = True
+        # Reads on worker threads (listing shards, dashboard buckets) report here too
+        self._lock = threading.Lock()
+        self._timings: Dict[str, float] = {}
+        self._counters: Dict[str, float] = {}
+        self._properties: Dict[str, Any] = {}
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time a block as '<name>_ms'; repeated spans in one invocation add up."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._timings[name] = self._timings.get(name, 0.0) + elapsed
+
+    def timed(self, name: str) -> Callable:
+        """Decorator form of span()."""
+        def decorate(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_property(self, name: str, value: Any) -> None:
+        """Attach a non-metric field (searchable in Logs Insights) to this invocation's line."""
+        with self._lock:
+            self._properties[name] = value
+
+    def handler(self, service: str) -> Callable:
+        """
+        Wrap a lambda_handler: time the invocation, count failures and flush.
+
+        An invocation counts as an error if it raises or returns a 5xx
+        statusCode (API handlers turn exceptions into 500 responses). The
+        service name stays with the wrapper: decorating another handler in
+        the same process does not relabel this one.
+        """
+        def decorate(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(event: Any, context: Any) -> Any:
+                error = True
+                try:
+                    with self.span('invocation'):
+                        result = func(event, context)
+                    error = isinstance(result, dict) and result.get('statusCode', 200) >= 500
+                    return result
+                finally:
+                    self.count('errors', int(error))
+                    self.flush(getattr(context, 'aws_request_id', None), service)
+            return wrapper
+        return decorate
+
+    def flush(self, request_id: Any = None, service: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Print the collected metrics as an EMF line and reset for the next
+        invocation. `service` defaults to the function name.
+        """
+        with self._lock:
+            timings, self._timings = self._timings, {}
+            counters, self._counters = self._counters, {}
+            properties, self._properties = self._properties, {}
+        cold_start, self.cold_start = self.cold_start, False
+
+        definitions = [{'Name': 'cold_start', 'Unit': 'Count'}]
+        record: Dict[str, Any] = {'Service': service or self.service, 'cold_start': int(cold_start)}
+        for name, elapsed in sorted(timings.items()):
+            definitions.append({'Name': name + '_ms', 'Unit': 'Milliseconds'})
+            record[name + '_ms'] = round(elapsed, 2)
+        for name, value in sorted(counters.items()):
+            definitions.append({'Name': name, 'Unit': 'Bytes' if name.startswith('bytes_') else 'Count'})
+            record[name] = value
+        record.update(properties)
+        if request_id:
+            record['request_id'] = request_id
+        record['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Service']],
+                'Metrics': definitions,
+            }],
+        }
+        if METRICS_ENABLED:
+            print(json.dumps(record, default=str))
+        return record
+
+
+# One per container: every function loads its own copy of the layer
+metrics = Metrics()
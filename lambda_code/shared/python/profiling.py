@@ -0,0 +1,147 @@
+"""
+Opt-in sampling profiler for production invocations (shared layer).
+
+With PROFILE_SAMPLE_RATE above 0, that fraction of invocations is
+stack-sampled: a background thread records the stacks of the handler and
+any busy worker threads every PROFILE_INTERVAL_MS. Samples are written as
+gzipped collapsed stacks ('frame;frame;frame count' per line, the input of
+flamegraph.pl and speedscope) to
+
+    s3://<PROFILE_BUCKET>/<PROFILE_PREFIX><function>/<date>/<time>-<request id>.collapsed.gz
+
+scripts/merge_profiles.py merges any number of them into one file. The
+size-tracking function ignores objects and events under PROFILE_PREFIX
+(see is_profile_key), so uploads never show up as bucket activity.
+
+    from profiling import profiler
+
+    @metrics.handler('plotting')
+    @profiler.sampled
+    def lambda_handler(event, context):
+        ...
+"""
+
+import functools
+import gzip
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Optional
+
+from clients import client
+
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '5'))
+PROFILE_BUCKET = os.environ.get('PROFILE_BUCKET') or os.environ.get('BUCKET_NAME')
+PROFILE_PREFIX = os.environ.get('PROFILE_PREFIX', '_profiles/')
+
+
+def is_profile_key(key: str) -> bool:
+    """True for objects written by the profiler, which bucket accounting skips."""
+    return bool(PROFILE_PREFIX) and key.startswith(PROFILE_PREFIX)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle_worker(frame) -> bool:
+    # Pool threads waiting for work sit in _worker itself (the queue get is C code)
+    code = frame.f_code
+    return code.co_name == '_worker' and code.co_filename.endswith(os.path.join('concurrent', 'futures', 'thread.py'))
+
+
+class StackSampler:
+    """Wall-clock sampler of every other thread's Python stack."""
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval = interval_seconds
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me or _is_idle_worker(frame):
+                    continue
+                if ident not in names:
+                    names.update((t.ident, t.name) for t in threading.enumerate())
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                # Root first, with the thread as the outermost frame
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+def collapse(samples: Counter) -> bytes:
+    """Collapsed-stack text, heaviest stacks first."""
+    return ''.join(f"{stack} {count}\n" for stack, count in samples.most_common()).encode('utf-8')
+
+
+class Profiler:
+    def __init__(self, sample_rate: float, interval_ms: float,
+                 bucket: Optional[str], prefix: str) -> None:
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.bucket = bucket
+        self.prefix = prefix
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and bool(self.bucket)
+
+    def sampled(self, func: Callable) -> Callable:
+        """Profile a random PROFILE_SAMPLE_RATE fraction of a handler's invocations."""
+        @functools.wraps(func)
+        def wrapper(event: Any, context: Any) -> Any:
+            if not self.enabled or random.random() >= self.sample_rate:
+                return func(event, context)
+            sampler = StackSampler(self.interval)
+            sampler.start()
+            try:
+                return func(event, context)
+            finally:
+                self._upload(sampler.stop(), getattr(context, 'aws_request_id', None))
+        return wrapper
+
+    def _upload(self, samples: Counter, request_id: Optional[str]) -> None:
+        """Write the profile to S3; failures are logged, never raised into the handler."""
+        if not samples:
+            return
+        function = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+        now = time.gmtime()
+        key = (f"{self.prefix}{function}/{time.strftime('%Y-%m-%d', now)}/"
+               f"{time.strftime('%H%M%S', now)}-{request_id or int(time.time() * 1000)}.collapsed.gz")
+        try:
+            client('s3').put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=gzip.compress(collapse(samples)),
+                ContentType='application/gzip',
+            )
+            print(f"Profile with {sum(samples.values())} samples written to s3://{self.bucket}/{key}")
+        except Exception as e:
+            print(f"Error writing profile: {str(e)}")
+
+
+# One per container: every function loads its own copy of the layer
+profiler = Profiler(PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_BUCKET, PROFILE_PREFIX)
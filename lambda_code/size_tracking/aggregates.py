@@ -0,0 +1,167 @@
+"""
+Derived aggregates maintained from size history rows.
+
+Each history row is folded into:
+- a per-bucket stats item (historical high/low and last value), and
+- per-tier rollup items holding min/max/last/count per minute, hour and day.
+
+All updates are conditional so that concurrent writers, late rows and
+replays of the same row never regress or double count an aggregate.
+"""
+
+from typing import Any, Dict, Iterable
+
+from botocore.exceptions import ClientError
+
+# Partition-key suffixes; '#' cannot appear in a bucket name
+STATS_KEY_SUFFIX = '#stats'
+ROLLUP_KEY_INFIX = '#rollup#'
+
+ROLLUP_TIER_SECONDS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+}
+
+
+def update_aggregates(table, item: Dict[str, Any], rollup_tiers: Iterable[str]) -> None:
+    """
+    Fold a history row into every aggregate derived from it.
+    
+    Args:
+        table: DynamoDB history table resource
+        item: History row with bucket_name, timestamp, total_size and object_count
+        rollup_tiers: Names of the rollup tiers to maintain
+    """
+    update_bucket_stats(table, item)
+    for tier in rollup_tiers:
+        update_rollup(table, item, tier)
+
+
+def update_bucket_stats(table, item: Dict[str, Any]) -> None:
+    """
+    Fold a history row into the bucket's materialized stats item.
+    
+    The stats item holds the historical high and low of total_size and the
+    most recent row. Every field is only ever moved forward by a conditional
+    update, so concurrent or replayed writers cannot regress it.
+    
+    Args:
+        table: DynamoDB history table resource
+        item: History row with bucket_name, timestamp, total_size and object_count
+    """
+    key = {'bucket_name': item['bucket_name'] + STATS_KEY_SUFFIX, 'timestamp': 0}
+    size = item['total_size']
+    timestamp = item['timestamp']
+    
+    # Update the last value first; the old image tells us whether the high
+    # or low need to move, which they usually do not.
+    try:
+        response = table.update_item(
+            Key=key,
+            UpdateExpression='SET last_size = :size, last_count = :count, last_timestamp = :ts',
+            ConditionExpression='attribute_not_exists(last_timestamp) OR last_timestamp <= :ts',
+            ExpressionAttributeValues={':size': size, ':count': item['object_count'], ':ts': timestamp},
+            ReturnValues='ALL_OLD'
+        )
+        previous = response.get('Attributes', {})
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # A newer row already landed; we know nothing about high/low, so try both
+        previous = {}
+    
+    if 'historical_high' not in previous or int(previous['historical_high']) < size:
+        _conditional_update(
+            table, key, 'SET historical_high = :size, historical_high_at = :ts',
+            'attribute_not_exists(historical_high) OR historical_high < :size',
+            {':size': size, ':ts': timestamp}
+        )
+    if 'historical_low' not in previous or int(previous['historical_low']) > size:
+        _conditional_update(
+            table, key, 'SET historical_low = :size, historical_low_at = :ts',
+            'attribute_not_exists(historical_low) OR historical_low > :size',
+            {':size': size, ':ts': timestamp}
+        )
+
+
+def update_rollup(table, item: Dict[str, Any], tier: str) -> None:
+    """
+    Fold a history row into the rollup bucket of one tier.
+    
+    Rollup items live in the '<bucket>#rollup#<tier>' partition with the
+    bucket start as their timestamp. sample_count only advances for rows
+    newer than the last applied one, which makes a replay of the same row a
+    no-op. A row with the same timestamp as the last one replaced it in the
+    history table, so it updates the last_* fields (as the stats item does)
+    without being counted again; min/max are idempotent by nature.
+    
+    Args:
+        table: DynamoDB history table resource
+        item: History row with bucket_name, timestamp, total_size and object_count
+        tier: Rollup tier name, a key of ROLLUP_TIER_SECONDS
+    """
+    tier_seconds = ROLLUP_TIER_SECONDS[tier]
+    timestamp = item['timestamp']
+    size = item['total_size']
+    key = {
+        'bucket_name': item['bucket_name'] + ROLLUP_KEY_INFIX + tier,
+        'timestamp': int(timestamp) // tier_seconds * tier_seconds,
+    }
+    
+    # Common case: one call sets last, counts the row and seeds min/max
+    try:
+        response = table.update_item(
+            Key=key,
+            UpdateExpression=(
+                'SET last_size = :size, last_count = :count, last_timestamp = :ts, '
+                'min_size = if_not_exists(min_size, :size), max_size = if_not_exists(max_size, :size) '
+                'ADD sample_count :one'
+            ),
+            ConditionExpression='attribute_not_exists(last_timestamp) OR last_timestamp < :ts',
+            ExpressionAttributeValues={
+                ':size': size, ':count': item['object_count'], ':ts': timestamp, ':one': 1
+            },
+            ReturnValues='ALL_NEW'
+        )
+        current = response['Attributes']
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        # Same-second row, which overwrote the last one in history, or a late
+        # or replayed row; either can still widen min/max
+        _conditional_update(
+            table, key, 'SET last_size = :size, last_count = :count',
+            'last_timestamp = :ts',
+            {':size': size, ':count': item['object_count'], ':ts': timestamp}
+        )
+        current = {}
+    
+    if 'min_size' not in current or int(current['min_size']) > size:
+        _conditional_update(
+            table, key, 'SET min_size = :size',
+            'attribute_not_exists(min_size) OR min_size > :size',
+            {':size': size}
+        )
+    if 'max_size' not in current or int(current['max_size']) < size:
+        _conditional_update(
+            table, key, 'SET max_size = :size',
+            'attribute_not_exists(max_size) OR max_size < :size',
+            {':size': size}
+        )
+
+
+def _conditional_update(table, key: Dict[str, Any], update: str, condition: str,
+                        values: Dict[str, Any]) -> bool:
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression=update,
+            ConditionExpression=condition,
+            ExpressionAttributeValues=values
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
@@ -0,0 +1,136 @@
+"""
+Per-bucket coalescing of history writes.
+
+With a minimum interval configured, at most one history row is persisted
+per bucket per interval. The first batch after the interval has elapsed
+claims the write; batches arriving inside the interval only fold their
+event metadata into a pending item, and the bucket is added to a registry
+of buckets with unpersisted events. A scheduled flush persists whatever is
+still pending, so the latest state is always recorded eventually.
+
+Items (history table, timestamp 0):
+- <bucket>#state:   last_persisted_at, the claim on the next write
+- <bucket>#pending: event_count, triggered_by, last_event_time, pending_since
+- #coalesce:        pending_buckets, a string set of bucket names
+"""
+
+from typing import Any, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+# '#' cannot appear in a bucket name, so none of these collide with history
+STATE_KEY_SUFFIX = '#state'
+PENDING_KEY_SUFFIX = '#pending'
+REGISTRY_KEY = '#coalesce'
+
+
+def claim_persist(table, bucket_name: str, now: int, interval: int) -> bool:
+    """
+    Claim the right to persist a history row for a bucket.
+
+    The claim is a conditional write on last_persisted_at, so among
+    concurrent invocations within one interval only one wins.
+    """
+    try:
+        table.update_item(
+            Key={'bucket_name': bucket_name + STATE_KEY_SUFFIX, 'timestamp': 0},
+            UpdateExpression='SET last_persisted_at = :now',
+            ConditionExpression='attribute_not_exists(last_persisted_at) OR last_persisted_at <= :due',
+            ExpressionAttributeValues={':now': now, ':due': now - interval}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def record_pending(table, bucket_name: str, records: List[Dict[str, Any]], now: int) -> None:
+    """
+    Fold a deferred batch of S3 event records into the bucket's pending item.
+
+    The pending item is written before the bucket is registered, so a flush
+    that unregisters the bucket concurrently can never strand it.
+    """
+    update = ('ADD event_count :n '
+              'SET triggered_by = :event, pending_since = if_not_exists(pending_since, :now)')
+    values: Dict[str, Any] = {
+        ':n': len(records),
+        ':event': records[-1]['eventName'],
+        ':now': now,
+    }
+    event_times = [r['eventTime'] for r in records if r.get('eventTime')]
+    if event_times:
+        # Concurrent batches may set this out of order; take_pending callers
+        # combine it with their own records using max()
+        update += ', last_event_time = :event_time'
+        values[':event_time'] = max(event_times)
+
+    table.update_item(
+        Key={'bucket_name': bucket_name + PENDING_KEY_SUFFIX, 'timestamp': 0},
+        UpdateExpression=update,
+        ExpressionAttributeValues=values
+    )
+    _register(table, bucket_name)
+
+
+def restore_pending(table, bucket_name: str, pending: Dict[str, Any]) -> None:
+    """
+    Put back a pending item returned by take_pending whose row was not written.
+
+    Batches deferred since the take may have started a new pending item;
+    the restored events are older, so they only fill in what that item
+    does not have yet.
+    """
+    update = 'ADD event_count :n SET pending_since = :since'
+    values: Dict[str, Any] = {':n': pending.get('event_count', 0), ':since': pending['pending_since']}
+    if 'triggered_by' in pending:
+        update += ', triggered_by = if_not_exists(triggered_by, :event)'
+        values[':event'] = pending['triggered_by']
+    if 'last_event_time' in pending:
+        update += ', last_event_time = if_not_exists(last_event_time, :event_time)'
+        values[':event_time'] = pending['last_event_time']
+
+    table.update_item(
+        Key={'bucket_name': bucket_name + PENDING_KEY_SUFFIX, 'timestamp': 0},
+        UpdateExpression=update,
+        ExpressionAttributeValues=values
+    )
+    _register(table, bucket_name)
+
+
+def _register(table, bucket_name: str) -> None:
+    table.update_item(
+        Key={'bucket_name': REGISTRY_KEY, 'timestamp': 0},
+        UpdateExpression='ADD pending_buckets :bucket',
+        ExpressionAttributeValues={':bucket': {bucket_name}}
+    )
+
+
+def take_pending(table, bucket_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Atomically remove and return the bucket's pending item, if any.
+
+    The bucket is unregistered first: events deferred after that point
+    re-register it, so they are picked up by the next flush at the latest.
+    Callers hand the item to restore_pending if its row is not written.
+    """
+    table.update_item(
+        Key={'bucket_name': REGISTRY_KEY, 'timestamp': 0},
+        UpdateExpression='DELETE pending_buckets :bucket',
+        ExpressionAttributeValues={':bucket': {bucket_name}}
+    )
+    response = table.delete_item(
+        Key={'bucket_name': bucket_name + PENDING_KEY_SUFFIX, 'timestamp': 0},
+        ReturnValues='ALL_OLD'
+    )
+    return response.get('Attributes')
+
+
+def pending_buckets(table) -> List[str]:
+    """Return the buckets that currently have deferred, unpersisted events."""
+    response = table.get_item(
+        Key={'bucket_name': REGISTRY_KEY, 'timestamp': 0},
+        ConsistentRead=True
+    )
+    return sorted(response.get('Item', {}).get('pending_buckets', set()))
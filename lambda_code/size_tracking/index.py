@@ -5,78 +5,207 @@ Triggered by S3 events, calculates and records bucket size to DynamoDB.
 """
 
 import json
-import boto3
 import time
 import os
 from datetime import datetime
-from typing import Dict, Any
+from decimal import Decimal, ROUND_DOWN
+from typing import Dict, Any, List, Optional
+from urllib.parse import unquote_plus
 
-# Initialize AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+from botocore.exceptions import ClientError
+
+from aggregates import update_aggregates
+from clients import client, resource
+from coalesce import claim_persist, pending_buckets, record_pending, restore_pending, take_pending
+from instrumentation import metrics
+from listing import parallel_bucket_totals
+from prefixes import PrefixStats
+from profiling import is_profile_key, profiler
+
+# Threads used for full listings; above 1 the bucket is listed in prefix shards
+RECOUNT_CONCURRENCY = int(os.environ.get('RECOUNT_CONCURRENCY', '1'))
+
+# Initialize AWS clients (one pooled connection per listing thread)
+s3_client = client('s3', max_pool_connections=RECOUNT_CONCURRENCY)
+dynamodb = resource('dynamodb')
 
 # Get table name from environment variable (set by CDK)
 TABLE_NAME = os.environ.get('TABLE_NAME', 'S3-object-size-history')
 table = dynamodb.Table(TABLE_NAME)
 
+# 'full' re-lists the bucket on every event; 'incremental' applies per-event
+# deltas to a running total and only re-lists every RECOUNT_INTERVAL_SECONDS.
+TRACKING_MODE = os.environ.get('TRACKING_MODE', 'full')
+RECOUNT_INTERVAL_SECONDS = int(os.environ.get('RECOUNT_INTERVAL_SECONDS', '3600'))
+TOMBSTONE_TTL_SECONDS = int(os.environ.get('TOMBSTONE_TTL_SECONDS', '86400'))
+
+# Incremental bookkeeping lives in the history table under synthetic partition
+# keys. '#' cannot appear in a bucket name, so these never collide with the
+# per-bucket history partitions.
+STATE_KEY_SUFFIX = '#state'
+OBJECT_KEY_INFIX = '#obj#'
+
+# Rollup tiers maintained alongside the raw history; empty disables rollups
+ROLLUP_TIERS = [t for t in os.environ.get('ROLLUP_TIERS', 'minute,hour,day').split(',') if t]
+# Per-prefix snapshots: aggregation depth (0 disables), max distinct prefixes
+# kept per snapshot, minimum interval between snapshots and their lifetime
+PREFIX_DEPTH = int(os.environ.get('PREFIX_DEPTH', '0'))
+PREFIX_CAPACITY = int(os.environ.get('PREFIX_CAPACITY', '1000'))
+PREFIX_SNAPSHOT_INTERVAL_SECONDS = int(os.environ.get('PREFIX_SNAPSHOT_INTERVAL_SECONDS', '300'))
+PREFIX_SNAPSHOT_TTL_SECONDS = int(os.environ.get('PREFIX_SNAPSHOT_TTL_SECONDS', str(30 * 86400)))
+PREFIX_KEY_SUFFIX = '#prefixes'
+
+# bucket -> time this container last saw a prefix snapshot taken (by it or,
+# when its claim failed, by another); saves listing with prefix stats and
+# claiming while one is known not to be due
+_last_prefix_snapshot: Dict[str, float] = {}
 
+# 'inline' updates aggregates after each write; 'stream' leaves them to the
+# DynamoDB Streams consumer in stream_consumer.py
+AGGREGATION_MODE = os.environ.get('AGGREGATION_MODE', 'inline')
+
+# Minimum seconds between persisted history rows per bucket; 0 writes a row
+# for every batch. Deferred events are persisted by the next batch after the
+# interval or by the scheduled flush, whichever comes first.
+COALESCE_INTERVAL_SECONDS = int(os.environ.get('COALESCE_INTERVAL_SECONDS', '0'))
+
+# Fractional digits of the history sort key. 0 keeps integer epoch seconds;
+# above 0, keys are fractional seconds (3 = milliseconds) and rows are written
+# conditionally, moving one unit later on collision, so bursts never overwrite
+# each other. Readers comparing keys as epoch seconds handle both formats.
+TIMESTAMP_PRECISION = int(os.environ.get('TIMESTAMP_PRECISION', '0'))
+TIMESTAMP_COLLISION_RETRIES = 10
+
+
+@metrics.handler('size_tracking')
+@profiler.sampled
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Lambda handler for S3 event triggers.
     
+    Records are grouped by bucket so that a batch of events for the same
+    bucket costs one metrics computation and one history row. With
+    coalescing enabled, buckets persisted less than COALESCE_INTERVAL_SECONDS
+    ago are deferred instead; scheduled invocations flush deferred buckets.
+    Deferred events taken for a row that is then not written are put back
+    for the next flush.
+    
+    When fed by the SQS buffer queue, a failure only fails the messages of
+    the affected bucket, which are reported back as batchItemFailures so
+    that SQS redelivers just those (and dead-letters them eventually).
+    
     Args:
-        event: S3 event containing bucket and object information
+        event: S3 event containing bucket and object information, an SQS
+            batch of S3 event messages, or a scheduled event /
+            {"flush": true} to flush deferred buckets
         context: Lambda context object
     
     Returns:
-        Response with status code and message
+        Response with status code and message, plus batchItemFailures for
+        SQS batches
     """
     
+    records = event.get('Records', [])
+    from_queue = bool(records) and records[0].get('eventSource') == 'aws:sqs'
+    # Pending items taken for rows not yet written, put back if the write fails
+    taken: Dict[str, Dict[str, Any]] = {}
+    
     try:
-        # Extract bucket name from the S3 event
-        # S3 events can contain multiple records
-        for record in event.get('Records', []):
-            # Get bucket name from the event
-            bucket_name = record['s3']['bucket']['name']
-            event_name = record['eventName']
-            
-            print(f"Processing S3 event: {event_name} for bucket: {bucket_name}")
-            
-            # Calculate total size and count of all objects in the bucket
-            total_size, object_count = calculate_bucket_metrics(bucket_name)
-            
-            # Get current timestamp
-            timestamp = int(time.time())  # Unix timestamp (epoch)
-            recorded_at = datetime.utcnow().isoformat() + 'Z'  # ISO format for display
-            
-            # Prepare item for DynamoDB
-            item = {
-                'bucket_name': bucket_name,
-                'timestamp': timestamp,
-                'total_size': total_size,
-                'object_count': object_count,
-                'recorded_at': recorded_at,
-                'triggered_by': event_name  # Track what type of event triggered this
-            }
-            
-            # Write to DynamoDB
-            write_to_dynamodb(item)
-            
-            print(f"Successfully recorded metrics - Size: {total_size} bytes, Objects: {object_count}")
+        items = []
+        snapshots = []
+        deferred = []
+        if event.get('source') == 'aws.events' or event.get('flush'):
+            items, snapshots = flush_pending(taken)
         
-        return {
+        message_ids: Dict[str, List[str]] = {}
+        failed_messages: List[str] = []
+        if from_queue:
+            records, message_ids, failed_messages = unwrap_sqs_records(records)
+        
+        # The profiler's own uploads are not bucket activity
+        records = [r for r in records if not is_profile_key(unquote_plus(r['s3']['object']['key']))]
+        
+        # S3 events can contain multiple records, possibly for several buckets
+        records_by_bucket = group_records_by_bucket(records)
+        
+        for bucket_name, records in records_by_bucket.items():
+            print(f"Processing {len(records)} S3 event(s) for bucket: {bucket_name}")
+            metrics.count('events_received', len(records))
+            try:
+                pending = None
+                if COALESCE_INTERVAL_SECONDS > 0:
+                    if not claim_persist(table, bucket_name, int(time.time()), COALESCE_INTERVAL_SECONDS):
+                        defer_events(bucket_name, records)
+                        deferred.append(bucket_name)
+                        continue
+                    pending = take_pending(table, bucket_name)
+                    if pending:
+                        taken[bucket_name] = pending
+                item, snapshot = build_history_item(bucket_name, records, pending)
+            except Exception as e:
+                if not from_queue:
+                    raise
+                print(f"Error processing bucket {bucket_name}: {str(e)}")
+                if bucket_name in taken:
+                    restore_taken({bucket_name: taken.pop(bucket_name)})
+                failed_messages.extend(message_ids[bucket_name])
+                continue
+            items.append(item)
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        
+        # Write all history rows (and any prefix snapshots) in one batch
+        try:
+            write_to_dynamodb(items, snapshots)
+        except Exception:
+            if not from_queue:
+                raise
+            # Redeliver every message that fed a row; the retry re-derives it
+            for item in items:
+                failed_messages.extend(message_ids.get(item['bucket_name'], []))
+            items = []
+            restore_taken(taken)
+        taken.clear()
+        
+        for item in items:
+            print(f"Successfully recorded metrics for {item['bucket_name']} - "
+                  f"Size: {item['total_size']} bytes, Objects: {item['object_count']}")
+        
+        # Top-level fields describe the last bucket processed, as before
+        last = items[-1] if items else {}
+        response = {
             'statusCode': 200,
             'body': json.dumps({
                 'message': 'Bucket size tracking completed successfully',
-                'bucket': bucket_name,
-                'total_size': total_size,
-                'object_count': object_count,
-                'timestamp': timestamp
-            })
+                'bucket': last.get('bucket_name'),
+                'total_size': last.get('total_size'),
+                'object_count': last.get('object_count'),
+                'timestamp': last.get('timestamp'),
+                'buckets': [
+                    {
+                        'bucket': item['bucket_name'],
+                        'total_size': item['total_size'],
+                        'object_count': item['object_count'],
+                        'event_count': item['event_count'],
+                    }
+                    for item in items
+                ],
+                'deferred': deferred
+            }, default=float)  # high-resolution timestamps are Decimals
         }
+        if from_queue:
+            # A message may carry records of several buckets; report it once
+            response['batchItemFailures'] = [
+                {'itemIdentifier': message_id} for message_id in dict.fromkeys(failed_messages)
+            ]
+        return response
         
     except Exception as e:
         print(f"Error in size-tracking lambda: {str(e)}")
+        restore_taken(taken)
+        if from_queue:
+            # Fail the whole batch so SQS redelivers it
+            raise
         return {
             'statusCode': 500,
             'body': json.dumps({
@@ -85,12 +214,267 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
 
 
-def calculate_bucket_metrics(bucket_name: str) -> tuple:
+def unwrap_sqs_records(messages: List[Dict[str, Any]]) -> tuple:
+    """
+    Extract the S3 event records carried by a batch of SQS messages.
+    
+    S3 sends an s3:TestEvent message when a notification configuration is
+    saved; it carries no records and is acknowledged without processing.
+    
+    Args:
+        messages: SQS records, each with an S3 event notification as body
+    
+    Returns:
+        Tuple of (S3 records in message order, mapping of bucket name to the
+        IDs of the messages that carried its records, IDs of messages that
+        could not be parsed)
+    """
+    records: List[Dict[str, Any]] = []
+    message_ids: Dict[str, List[str]] = {}
+    unparsable: List[str] = []
+    for message in messages:
+        try:
+            body = json.loads(message['body'])
+        except ValueError:
+            print(f"Unparsable SQS message {message['messageId']}")
+            unparsable.append(message['messageId'])
+            continue
+        if body.get('Event') == 's3:TestEvent':
+            continue
+        for record in body.get('Records', []):
+            records.append(record)
+            message_ids.setdefault(record['s3']['bucket']['name'], []).append(message['messageId'])
+    return records, message_ids, unparsable
+
+
+def group_records_by_bucket(records: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Group S3 event records by bucket name.
+    
+    Buckets keep the order in which they first appear, and records keep
+    their delivery order within each bucket.
+    
+    Args:
+        records: S3 event records
+    
+    Returns:
+        Mapping of bucket name to its records
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        grouped.setdefault(record['s3']['bucket']['name'], []).append(record)
+    return grouped
+
+
+def build_history_item(bucket_name: str, records: List[Dict[str, Any]],
+                       pending: Optional[Dict[str, Any]] = None) -> tuple:
+    """
+    Compute the metrics for one bucket and build its history row.
+    
+    The row timestamp is taken after the metrics are computed, so it marks
+    the moment the recorded state was observed. triggered_by is the last
+    event in delivery order; last_event_time is the latest S3 eventTime
+    among the coalesced records.
+    
+    Args:
+        bucket_name: Name of the S3 bucket
+        records: S3 event records for this bucket, in delivery order; empty
+            when flushing deferred events
+        pending: Deferred event metadata taken from the coalescing pending
+            item, folded into this row
+    
+    Returns:
+        Tuple of (history item, prefix snapshot item or None). A snapshot is
+        only produced when the bucket was fully listed during this call.
+    """
+    prefix_stats = _prefix_stats_if_due(bucket_name)
+    
+    # Calculate total size and count of all objects in the bucket
+    if TRACKING_MODE == 'incremental':
+        total_size, object_count = apply_incremental_events(bucket_name, records, prefix_stats)
+    else:
+        total_size, object_count = calculate_bucket_metrics(bucket_name, prefix_stats)
+    
+    # Get current timestamp
+    timestamp = history_timestamp()  # Unix timestamp (epoch)
+    recorded_at = datetime.utcnow().isoformat() + 'Z'  # ISO format for display
+    
+    # A flush has no records of its own; the deferred batch names the event
+    triggered_by = records[-1]['eventName'] if records else pending['triggered_by']
+    
+    item = {
+        'bucket_name': bucket_name,
+        'timestamp': timestamp,
+        'total_size': total_size,
+        'object_count': object_count,
+        'recorded_at': recorded_at,
+        'triggered_by': triggered_by,  # Track what type of event triggered this
+        'event_count': len(records),
+    }
+    event_times = [r['eventTime'] for r in records if r.get('eventTime')]
+    if pending:
+        item['event_count'] += int(pending.get('event_count', 0))
+        if pending.get('last_event_time'):
+            event_times.append(pending['last_event_time'])
+    if event_times:
+        # S3 eventTime values share one ISO-8601 format, so they sort as strings
+        item['last_event_time'] = max(event_times)
+    
+    snapshot = None
+    if prefix_stats is not None and prefix_stats.complete:
+        if _claim_prefix_snapshot(bucket_name, int(timestamp)):
+            snapshot = prefix_stats.to_item(bucket_name, timestamp, PREFIX_KEY_SUFFIX)
+            snapshot['expires_at'] = int(timestamp) + PREFIX_SNAPSHOT_TTL_SECONDS
+        _last_prefix_snapshot[bucket_name] = time.time()
+    return item, snapshot
+
+
+def history_timestamp() -> Any:
+    """Current epoch time as a history sort key at TIMESTAMP_PRECISION digits."""
+    if TIMESTAMP_PRECISION <= 0:
+        return int(time.time())
+    return Decimal(repr(time.time())).quantize(Decimal(1).scaleb(-TIMESTAMP_PRECISION), rounding=ROUND_DOWN)
+
+
+def defer_events(bucket_name: str, records: List[Dict[str, Any]]) -> None:
+    """
+    Fold a batch into the bucket's pending snapshot instead of persisting it.
+    
+    In incremental mode the deltas are still applied to the running totals
+    right away; only the history row is deferred. In full mode the listing
+    is skipped and happens once, when the pending snapshot is persisted.
+    """
+    if TRACKING_MODE == 'incremental':
+        apply_incremental_events(bucket_name, records)
+    record_pending(table, bucket_name, records, int(time.time()))
+    print(f"Deferred {len(records)} event(s) for {bucket_name}; "
+          f"last row persisted less than {COALESCE_INTERVAL_SECONDS}s ago")
+
+
+def flush_pending(taken: Dict[str, Dict[str, Any]]) -> tuple:
+    """
+    Build history rows for buckets with deferred events whose interval has elapsed.
+    
+    Buckets persisted too recently stay registered for the next flush.
+    
+    Args:
+        taken: Filled with the pending items consumed, by bucket, so the
+            caller can restore them if the rows are not written
+    
+    Returns:
+        Tuple of (history items, prefix snapshot items)
+    """
+    items = []
+    snapshots = []
+    for bucket_name in pending_buckets(table):
+        if not claim_persist(table, bucket_name, int(time.time()), COALESCE_INTERVAL_SECONDS):
+            continue
+        pending = take_pending(table, bucket_name)
+        if not pending:
+            continue
+        taken[bucket_name] = pending
+        print(f"Flushing {int(pending.get('event_count', 0))} deferred event(s) for {bucket_name}")
+        # No new records: incremental mode reads the running totals, full mode re-lists
+        item, snapshot = build_history_item(bucket_name, [], pending)
+        items.append(item)
+        if snapshot is not None:
+            snapshots.append(snapshot)
+    return items, snapshots
+
+
+def restore_taken(taken: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Re-register taken pending items whose history rows were not written.
+    
+    Best effort: a failure here is logged, so the error that caused the
+    restore is the one reported.
+    """
+    for bucket_name, pending in taken.items():
+        try:
+            restore_pending(table, bucket_name, pending)
+            print(f"Restored {int(pending.get('event_count', 0))} pending event(s) for {bucket_name}")
+        except Exception as e:
+            print(f"Error restoring pending events for {bucket_name}: {str(e)}")
+    taken.clear()
+
+
+def _prefix_stats_if_due(bucket_name: str) -> Optional[PrefixStats]:
+    """Return an empty accumulator if prefix snapshots are enabled and one is due."""
+    if PREFIX_DEPTH <= 0:
+        return None
+    last = _last_prefix_snapshot.get(bucket_name)
+    if last is not None and time.time() - last < PREFIX_SNAPSHOT_INTERVAL_SECONDS:
+        return None
+    return PrefixStats(PREFIX_DEPTH, PREFIX_CAPACITY)
+
+
+def _claim_prefix_snapshot(bucket_name: str, now: int) -> bool:
+    """
+    Claim the bucket's next prefix snapshot.
+
+    The claim is a conditional write on last_prefix_snapshot_at of the
+    state item, so concurrent containers take at most one snapshot per
+    PREFIX_SNAPSHOT_INTERVAL_SECONDS between them. It cannot live in the
+    #prefixes partition, where an extra item would read as a snapshot.
+    """
+    try:
+        table.update_item(
+            Key={'bucket_name': bucket_name + STATE_KEY_SUFFIX, 'timestamp': 0},
+            UpdateExpression='SET last_prefix_snapshot_at = :now',
+            ConditionExpression='attribute_not_exists(last_prefix_snapshot_at) OR last_prefix_snapshot_at <= :due',
+            ExpressionAttributeValues={':now': now, ':due': now - PREFIX_SNAPSHOT_INTERVAL_SECONDS}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def _list_objects(bucket_name: str, prefix_stats: Optional[PrefixStats] = None):
+    """
+    Yield every object in the bucket, feeding prefix_stats along the way.
+    
+    Profiles written under PROFILE_PREFIX are skipped. prefix_stats is
+    marked complete only if the listing finishes.
+    """
+    # Use paginator to handle buckets with many objects
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        metrics.count('pages_listed')
+        metrics.count('objects_listed', len(page.get('Contents', [])))
+        for obj in page.get('Contents', []):
+            if is_profile_key(obj['Key']):
+                continue
+            if prefix_stats is not None:
+                prefix_stats.add(obj['Key'], obj['Size'])
+            yield obj
+    if prefix_stats is not None:
+        prefix_stats.complete = True
+
+
+def _bucket_totals(bucket_name: str, prefix_stats: Optional[PrefixStats] = None) -> tuple:
+    """List the whole bucket, sharded across RECOUNT_CONCURRENCY threads when above 1."""
+    if RECOUNT_CONCURRENCY > 1:
+        return parallel_bucket_totals(s3_client, bucket_name, RECOUNT_CONCURRENCY, prefix_stats)
+    
+    total_size = 0
+    object_count = 0
+    for obj in _list_objects(bucket_name, prefix_stats):
+        total_size += obj['Size']
+        object_count += 1
+    return total_size, object_count
+
+
+@metrics.timed('calculate_bucket_metrics')
+def calculate_bucket_metrics(bucket_name: str, prefix_stats: Optional[PrefixStats] = None) -> tuple:
     """
     Calculate total size and count of all objects in the bucket.
     
     Args:
         bucket_name: Name of the S3 bucket
+        prefix_stats: Optional accumulator for per-prefix totals, filled in
+            the same pass
     
     Returns:
         Tuple of (total_size, object_count)
@@ -99,16 +483,7 @@ def calculate_bucket_metrics(bucket_name: str) -> tuple:
     object_count = 0
     
     try:
-        # Use paginator to handle buckets with many objects
-        paginator = s3_client.get_paginator('list_objects_v2')
-        page_iterator = paginator.paginate(Bucket=bucket_name)
-        
-        for page in page_iterator:
-            # Check if the bucket has any contents
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    total_size += obj['Size']
-                    object_count += 1
+        total_size, object_count = _bucket_totals(bucket_name, prefix_stats)
         
         print(f"Calculated metrics for {bucket_name}: {object_count} objects, {total_size} bytes")
         
@@ -120,18 +495,275 @@ def calculate_bucket_metrics(bucket_name: str) -> tuple:
     return total_size, object_count
 
 
-def write_to_dynamodb(item: Dict[str, Any]) -> None:
+@metrics.timed('apply_incremental_events')
+def apply_incremental_events(bucket_name: str, records: List[Dict[str, Any]],
+                             prefix_stats: Optional[PrefixStats] = None) -> tuple:
+    """
+    Apply S3 event records to the running totals of a bucket.
+
+    ObjectCreated records carry the new object size; the size previously
+    recorded for the same key (if any) is subtracted so overwrites are not
+    double counted. ObjectRemoved records subtract the remembered size.
+    A full recount is triggered when the state has never been counted or
+    the last recount is older than RECOUNT_INTERVAL_SECONDS.
+
+    Per-object bookkeeping is done record by record in delivery order; the
+    summed delta is then applied to the running totals in a single update.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        records: S3 event records for this bucket, in delivery order
+        prefix_stats: Optional accumulator, only filled if a recount runs
+
+    Returns:
+        Tuple of (total_size, object_count) after applying the events
+    """
+    delta_size = 0
+    delta_count = 0
+    for record in records:
+        s3_object = record['s3']['object']
+        key = unquote_plus(s3_object['key'])
+        sequencer = s3_object.get('sequencer')
+
+        if record['eventName'].startswith('ObjectRemoved'):
+            size_change, count_change = _forget_object(bucket_name, key, sequencer)
+        else:
+            size_change, count_change = _remember_object(
+                bucket_name, key, int(s3_object.get('size', 0)), sequencer
+            )
+        delta_size += size_change
+        delta_count += count_change
+
+    response = table.update_item(
+        Key={'bucket_name': bucket_name + STATE_KEY_SUFFIX, 'timestamp': 0},
+        UpdateExpression='ADD total_size :ds, object_count :dc',
+        ExpressionAttributeValues={':ds': delta_size, ':dc': delta_count},
+        ReturnValues='ALL_NEW'
+    )
+    state = response['Attributes']
+
+    if _claim_recount(bucket_name, state):
+        return recount_bucket(bucket_name, seed_index='last_recount' not in state,
+                              prefix_stats=prefix_stats)
+
+    return int(state['total_size']), int(state['object_count'])
+
+
+def _object_key(bucket_name: str, key: str) -> Dict[str, Any]:
+    return {'bucket_name': bucket_name + OBJECT_KEY_INFIX + key, 'timestamp': 0}
+
+
+def _sequencer_condition(sequencer: Optional[str]) -> Dict[str, Any]:
+    """
+    Build a condition that rejects events older than the one already applied.
+
+    S3 sequencers for the same key are hex strings of varying length; they
+    are ordered after left-padding the shorter value with zeros.
+    """
+    if not sequencer:
+        return {}
+    return {
+        'ConditionExpression': 'attribute_not_exists(sequencer) OR sequencer < :seq',
+        'ExpressionAttributeValues': {':seq': sequencer.rjust(32, '0')},
+    }
+
+
+def _remember_object(bucket_name: str, key: str, size: int,
+                     sequencer: Optional[str]) -> tuple:
+    """Record the size of a created/overwritten object and return the (size, count) delta."""
+    condition = _sequencer_condition(sequencer)
+    values = dict(condition.pop('ExpressionAttributeValues', {}), **{':size': size})
+    update = 'SET object_size = :size REMOVE deleted, expires_at'
+    if sequencer:
+        update = 'SET object_size = :size, sequencer = :seq REMOVE deleted, expires_at'
+
+    try:
+        response = table.update_item(
+            Key=_object_key(bucket_name, key),
+            UpdateExpression=update,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_OLD',
+            **condition
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Skipping out-of-order create event for {key}")
+            return 0, 0
+        raise
+
+    previous = response.get('Attributes')
+    if previous and not previous.get('deleted'):
+        return size - int(previous.get('object_size', 0)), 0
+    return size, 1
+
+
+def _forget_object(bucket_name: str, key: str, sequencer: Optional[str]) -> tuple:
+    """
+    Tombstone a deleted object and return the (size, count) delta.
+
+    The tombstone keeps the sequencer so a late-arriving create for the same
+    key is rejected; it expires via the table's TTL attribute.
+    """
+    condition = _sequencer_condition(sequencer)
+    values = dict(
+        condition.pop('ExpressionAttributeValues', {}),
+        **{':zero': 0, ':true': True, ':expires': int(time.time()) + TOMBSTONE_TTL_SECONDS}
+    )
+    update = 'SET object_size = :zero, deleted = :true, expires_at = :expires'
+    if sequencer:
+        update += ', sequencer = :seq'
+
+    try:
+        response = table.update_item(
+            Key=_object_key(bucket_name, key),
+            UpdateExpression=update,
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_OLD',
+            **condition
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Skipping out-of-order delete event for {key}")
+            return 0, 0
+        raise
+
+    previous = response.get('Attributes')
+    if previous and not previous.get('deleted'):
+        return -int(previous.get('object_size', 0)), -1
+
+    # Object predates incremental tracking; the next recount repairs the totals
+    print(f"No remembered size for deleted object {key}; totals will drift until recount")
+    return 0, 0
+
+
+def _claim_recount(bucket_name: str, state: Dict[str, Any]) -> bool:
+    """
+    Decide whether this invocation should run the periodic full recount.
+
+    The claim is a conditional write on last_recount so that only one of
+    several concurrent invocations performs the listing.
+    """
+    now = int(time.time())
+    last_recount = state.get('last_recount')
+    if last_recount is not None and now - int(last_recount) < RECOUNT_INTERVAL_SECONDS:
+        return False
+
+    try:
+        table.update_item(
+            Key={'bucket_name': bucket_name + STATE_KEY_SUFFIX, 'timestamp': 0},
+            UpdateExpression='SET last_recount = :now',
+            ConditionExpression='attribute_not_exists(last_recount) OR last_recount < :due',
+            ExpressionAttributeValues={':now': now, ':due': now - RECOUNT_INTERVAL_SECONDS + 1}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+@metrics.timed('recount_bucket')
+def recount_bucket(bucket_name: str, seed_index: bool = False,
+                   prefix_stats: Optional[PrefixStats] = None) -> tuple:
+    """
+    Re-list the bucket and overwrite the running totals to repair drift.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        seed_index: Also record every object's size. Used on the first
+            recount so that deletes of pre-existing objects can be applied.
+        prefix_stats: Optional accumulator for per-prefix totals
+
+    Returns:
+        Tuple of (total_size, object_count)
+    """
+    if seed_index:
+        # Seeding runs once per bucket and writes every key, so it stays sequential
+        total_size = 0
+        object_count = 0
+        with table.batch_writer() as batch:
+            for obj in _list_objects(bucket_name, prefix_stats):
+                total_size += obj['Size']
+                object_count += 1
+                batch.put_item(Item=dict(_object_key(bucket_name, obj['Key']), object_size=obj['Size']))
+    else:
+        total_size, object_count = _bucket_totals(bucket_name, prefix_stats)
+
+    table.update_item(
+        Key={'bucket_name': bucket_name + STATE_KEY_SUFFIX, 'timestamp': 0},
+        UpdateExpression='SET total_size = :total, object_count = :count',
+        ExpressionAttributeValues={':total': total_size, ':count': object_count}
+    )
+
+    print(f"Recounted {bucket_name}: {object_count} objects, {total_size} bytes")
+    return total_size, object_count
+
+
+@metrics.timed('write_to_dynamodb')
+def write_to_dynamodb(items: List[Dict[str, Any]],
+                      snapshots: Optional[List[Dict[str, Any]]] = None,
+                      unique: bool = False) -> None:
     """
     Write metrics to DynamoDB table.
     
+    Uses a batch writer, which groups puts into BatchWriteItem requests of
+    up to 25 items and retries unprocessed items. With high-resolution
+    timestamps, or when `unique` is set, history rows are put one by one
+    instead, since only single puts can be conditional (see _put_unique). Each bucket's stats item
+    and rollups are then updated, unless the stream consumer owns them, so
+    readers never need to scan the history partition.
+    
     Args:
-        item: Dictionary containing metrics to write
+        items: History rows to write, one per bucket
+        snapshots: Prefix snapshot items written in the same batch; they do
+            not feed the aggregates
+        unique: Put history rows conditionally even with whole-second
+            timestamps, for rows that must not replace an existing one
     """
+    if not items:
+        return
+    
     try:
-        response = table.put_item(Item=item)
-        print(f"Successfully wrote to DynamoDB: {item}")
+        batched = items + (snapshots or [])
+        if TIMESTAMP_PRECISION > 0 or unique:
+            for item in items:
+                _put_unique(item)
+            batched = snapshots or []
+        
+        with table.batch_writer() as batch:
+            for item in batched:
+                batch.put_item(Item=item)
+        print(f"Successfully wrote {len(items)} item(s) to DynamoDB")
+        metrics.count('items_written', len(items) + len(snapshots or []))
+        
+        if AGGREGATION_MODE == 'inline':
+            with metrics.span('update_aggregates'):
+                for item in items:
+                    update_aggregates(table, item, ROLLUP_TIERS)
         
     except Exception as e:
         print(f"Error writing to DynamoDB: {str(e)}")
         raise
 
+
+def _put_unique(item: Dict[str, Any]) -> None:
+    """
+    Put a history row without overwriting one with the same sort key.
+    
+    On collision the timestamp moves one unit of TIMESTAMP_PRECISION later
+    and the put is retried; the item is updated in place so the aggregates
+    see the key that was actually written. The integer-second value is
+    kept in timestamp_seconds for readers that expect whole seconds.
+    """
+    step = Decimal(1).scaleb(-TIMESTAMP_PRECISION)
+    for _ in range(TIMESTAMP_COLLISION_RETRIES):
+        item['timestamp_seconds'] = int(item['timestamp'])
+        try:
+            table.put_item(Item=item, ConditionExpression='attribute_not_exists(bucket_name)')
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            item['timestamp'] = Decimal(item['timestamp']) + step
+    raise RuntimeError(f"No free timestamp for {item['bucket_name']} after "
+                       f"{TIMESTAMP_COLLISION_RETRIES} attempts")
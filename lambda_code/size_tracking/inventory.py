@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Inventory Reconciliation Lambda Function
+Ingests an S3 Inventory manifest and records an authoritative size snapshot.
+
+Inventory data files are streamed row by row (CSV) or batch by batch
+(Parquet, when pyarrow is available), so memory stays bounded regardless of
+bucket size. The result is written through the same history item schema as
+event-driven rows, timestamped at the inventory's creation time.
+
+Usage (the shared layer must be importable when run locally):
+    PYTHONPATH=../shared/python python3 inventory.py <manifest.json | s3://bucket/path/manifest.json> [--dry-run]
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import unquote_plus, urlparse
+
+from index import (
+    PREFIX_CAPACITY,
+    PREFIX_DEPTH,
+    PREFIX_KEY_SUFFIX,
+    PREFIX_SNAPSHOT_TTL_SECONDS,
+    STATE_KEY_SUFFIX,
+    TRACKING_MODE,
+    s3_client,
+    table,
+    write_to_dynamodb,
+)
+from instrumentation import metrics
+from prefixes import PrefixStats
+from profiling import is_profile_key, profiler
+
+
+@metrics.handler('inventory_reconcile')
+@profiler.sampled
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Lambda handler for reconciliation runs.
+
+    Args:
+        event: {"manifest": "s3://<destination>/<path>/manifest.json", "dry_run": false}
+        context: Lambda context object
+
+    Returns:
+        Response with the reconciled totals
+    """
+    try:
+        result = reconcile(event['manifest'], dry_run=bool(event.get('dry_run')))
+        return {'statusCode': 200, 'body': json.dumps(result)}
+    except Exception as e:
+        print(f"Error in inventory reconciliation: {str(e)}")
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+
+
+def reconcile(manifest_source: str, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Compute totals from an inventory and write them as a history row.
+
+    The row is put conditionally, so it never replaces an event-driven row
+    with the same timestamp. In incremental mode the result also reports
+    the drift of the running total against the inventory. The drift is
+    only reported, never applied: the running total already includes
+    events from after the inventory was taken, so it cannot be corrected
+    from the inventory alone.
+
+    Args:
+        manifest_source: Local path or s3:// URL of manifest.json
+        dry_run: Compute and return the totals without writing anything
+
+    Returns:
+        Summary of the reconciled snapshot
+    """
+    manifest = _read_json(manifest_source)
+    bucket_name = manifest['sourceBucket']
+    # creationTimestamp is epoch milliseconds
+    timestamp = int(manifest['creationTimestamp']) // 1000
+
+    prefix_stats = PrefixStats(PREFIX_DEPTH, PREFIX_CAPACITY) if PREFIX_DEPTH > 0 else None
+    total_size = 0
+    object_count = 0
+    with metrics.span('read_inventory'):
+        for key, size in iter_inventory_objects(manifest, manifest_source):
+            total_size += size
+            object_count += 1
+            if prefix_stats is not None:
+                prefix_stats.add(key, size)
+    metrics.count('objects_listed', object_count)
+
+    item = {
+        'bucket_name': bucket_name,
+        'timestamp': timestamp,
+        'total_size': total_size,
+        'object_count': object_count,
+        'recorded_at': datetime.utcfromtimestamp(timestamp).isoformat() + 'Z',
+        'triggered_by': 'InventoryReconciliation',
+        'event_count': 0,
+    }
+    snapshots = []
+    if prefix_stats is not None:
+        prefix_stats.complete = True
+        snapshot = prefix_stats.to_item(bucket_name, timestamp, PREFIX_KEY_SUFFIX)
+        snapshot['expires_at'] = timestamp + PREFIX_SNAPSHOT_TTL_SECONDS
+        snapshots.append(snapshot)
+
+    result = {
+        'bucket': bucket_name,
+        'timestamp': timestamp,
+        'total_size': total_size,
+        'object_count': object_count,
+        'dry_run': dry_run,
+    }
+    if dry_run:
+        return result
+
+    write_to_dynamodb([item], snapshots, unique=True)
+    if TRACKING_MODE == 'incremental':
+        result['drift'] = _running_total_drift(bucket_name, total_size, object_count)
+
+    print(f"Reconciled {bucket_name} from inventory: {object_count} objects, {total_size} bytes")
+    return result
+
+
+def _running_total_drift(bucket_name: str, total_size: int, object_count: int) -> Dict[str, int]:
+    """Difference between the incremental running total and the inventory totals."""
+    response = table.get_item(Key={'bucket_name': bucket_name + STATE_KEY_SUFFIX, 'timestamp': 0})
+    state = response.get('Item', {})
+    return {
+        'total_size': int(state.get('total_size', 0)) - total_size,
+        'object_count': int(state.get('object_count', 0)) - object_count,
+    }
+
+
+def iter_inventory_objects(manifest: Dict[str, Any], manifest_source: str) -> Iterator[Tuple[str, int]]:
+    """
+    Yield (key, size) for every current object listed by the inventory.
+
+    Delete markers and non-current versions, present in versioned
+    inventories, are skipped, as are profiles under PROFILE_PREFIX.
+    """
+    file_format = manifest.get('fileFormat', 'CSV').upper()
+    columns = [c.strip() for c in manifest.get('fileSchema', '').split(',')]
+
+    for entry in manifest.get('files', []):
+        if file_format == 'CSV':
+            rows = _iter_csv(_open_data_file(entry['key'], manifest, manifest_source), columns)
+        elif file_format == 'PARQUET':
+            rows = _iter_parquet(entry['key'], manifest, manifest_source)
+        else:
+            raise ValueError(f"Unsupported inventory format {file_format}; use CSV or Parquet")
+
+        for row in rows:
+            if str(row.get('IsLatest', 'true')).lower() != 'true':
+                continue
+            if str(row.get('IsDeleteMarker', 'false')).lower() == 'true':
+                continue
+            size = row.get('Size')
+            if size in (None, '') or is_profile_key(row['Key']):
+                continue
+            yield row['Key'], int(size)
+
+
+def _iter_csv(stream, columns) -> Iterator[Dict[str, Any]]:
+    """Stream rows of a gzipped, header-less inventory CSV."""
+    try:
+        with gzip.GzipFile(fileobj=stream) as gz:
+            reader = csv.reader(io.TextIOWrapper(gz, encoding='utf-8', newline=''))
+            for values in reader:
+                row = dict(zip(columns, values))
+                # Keys in CSV inventories are URL-encoded
+                row['Key'] = unquote_plus(row['Key'])
+                yield row
+    finally:
+        stream.close()
+
+
+def _iter_parquet(key: str, manifest: Dict[str, Any], manifest_source: str) -> Iterator[Dict[str, Any]]:
+    """Stream rows of a Parquet inventory file in record batches."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet inventories require pyarrow; add it to the function's layer")
+
+    local_path, cleanup = _local_copy(key, manifest, manifest_source)
+    try:
+        parquet = pq.ParquetFile(local_path)
+        # Parquet inventory columns are lower snake case
+        names = {'key': 'Key', 'size': 'Size', 'is_latest': 'IsLatest', 'is_delete_marker': 'IsDeleteMarker'}
+        wanted = [c for c in names if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=10000, columns=wanted):
+            for record in batch.to_pylist():
+                yield {names[k]: v for k, v in record.items()}
+    finally:
+        if cleanup:
+            os.remove(local_path)
+
+
+def _is_s3(source: str) -> bool:
+    return source.startswith('s3://')
+
+
+def _destination_bucket(manifest: Dict[str, Any], manifest_source: str) -> str:
+    destination = manifest.get('destinationBucket', '')
+    if destination.startswith('arn:aws:s3:::'):
+        return destination[len('arn:aws:s3:::'):]
+    return urlparse(manifest_source).netloc
+
+
+def _local_data_path(key: str, manifest_source: str) -> str:
+    """Data files of a local manifest are looked up as-is, then next to the manifest."""
+    if os.path.exists(key):
+        return key
+    return os.path.join(os.path.dirname(os.path.abspath(manifest_source)), os.path.basename(key))
+
+
+def _open_data_file(key: str, manifest: Dict[str, Any], manifest_source: str):
+    if _is_s3(manifest_source):
+        response = s3_client.get_object(Bucket=_destination_bucket(manifest, manifest_source), Key=key)
+        return response['Body']
+    return open(_local_data_path(key, manifest_source), 'rb')
+
+
+def _local_copy(key: str, manifest: Dict[str, Any], manifest_source: str) -> Tuple[str, bool]:
+    """Parquet needs a seekable file; S3 objects are downloaded to /tmp first."""
+    if not _is_s3(manifest_source):
+        return _local_data_path(key, manifest_source), False
+    fd, path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    s3_client.download_file(_destination_bucket(manifest, manifest_source), key, path)
+    return path, True
+
+
+def _read_json(source: str) -> Dict[str, Any]:
+    if _is_s3(source):
+        parsed = urlparse(source)
+        response = s3_client.get_object(Bucket=parsed.netloc, Key=parsed.path.lstrip('/'))
+        return json.loads(response['Body'].read())
+    with open(source, 'rb') as f:
+        return json.load(f)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('manifest', help='Local path or s3:// URL of an inventory manifest.json')
+    parser.add_argument('--dry-run', action='store_true', help='Compute totals without writing to DynamoDB')
+    args = parser.parse_args(argv)
+    print(json.dumps(reconcile(args.manifest, dry_run=args.dry_run), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Parallel, prefix-sharded bucket listing for full recounts.
+
+The key space is split into shards by listing with Delimiter='/' (expanding
+one level deeper while there are fewer shards than workers). A level whose
+objects do not fit in one page is not expanded but kept as a leaf prefix.
+When there are still fewer shards than workers, each leaf prefix is split
+further into key ranges (listed with StartAfter) on the character after the
+prefix. Shards are then listed concurrently, and their partial sums are
+merged in shard order so the result does not depend on which worker
+finished first.
+
+The range split points are spread evenly over RANGE_ALPHABET, which suits
+hashed or random key names. Keys that share a longer common start (dates,
+sequence numbers) mostly fall into one range and list serially.
+"""
+
+import string
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from instrumentation import metrics
+from prefixes import PrefixStats
+from profiling import is_profile_key
+
+# How many '/' levels discovery may descend looking for enough shards
+MAX_SHARD_DEPTH = 3
+
+# Characters after a leaf prefix at which it is split into key ranges
+RANGE_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+# (prefix, StartAfter key, last key), the keys None when unbounded
+Shard = Tuple[str, Optional[str], Optional[str]]
+
+
+def _list_level(s3_client, bucket_name: str, prefix: str,
+                prefix_stats: Optional[PrefixStats]) -> Optional[Tuple[List[str], int, int]]:
+    """
+    List one '/' level under a prefix.
+
+    Returns:
+        Tuple of (child prefixes, size of objects directly under the
+        prefix, count of objects directly under the prefix), or None if
+        the first page already holds objects and is not the last; such a
+        level is listed as a leaf instead, split into key ranges
+    """
+    children: List[str] = []
+    total_size = 0
+    object_count = 0
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page_number, page in enumerate(paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter='/')):
+        metrics.count('pages_listed')
+        metrics.count('objects_listed', len(page.get('Contents', [])))
+        if page_number == 0 and page.get('IsTruncated') and page.get('Contents'):
+            return None
+        # Every key under a child starting with the profile prefix is a profile
+        children.extend(cp['Prefix'] for cp in page.get('CommonPrefixes', [])
+                        if not is_profile_key(cp['Prefix']))
+        for obj in page.get('Contents', []):
+            if is_profile_key(obj['Key']):
+                continue
+            total_size += obj['Size']
+            object_count += 1
+            if prefix_stats is not None:
+                prefix_stats.add(obj['Key'], obj['Size'])
+    return children, total_size, object_count
+
+
+def _list_shard(s3_client, bucket_name: str, shard: Shard,
+                prefix_stats: Optional[PrefixStats]) -> Tuple[int, int]:
+    prefix, start_after, last_key = shard
+    total_size = 0
+    object_count = 0
+    kwargs = {'Bucket': bucket_name, 'Prefix': prefix}
+    if start_after is not None:
+        kwargs['StartAfter'] = start_after
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(**kwargs):
+        contents = page.get('Contents', [])
+        metrics.count('pages_listed')
+        metrics.count('objects_listed', len(contents))
+        # Keys are listed in UTF-8 byte order, which str comparison matches
+        in_range = contents if last_key is None else [obj for obj in contents if obj['Key'] <= last_key]
+        for obj in in_range:
+            if is_profile_key(obj['Key']):
+                continue
+            total_size += obj['Size']
+            object_count += 1
+            if prefix_stats is not None:
+                prefix_stats.add(obj['Key'], obj['Size'])
+        if len(in_range) < len(contents):
+            break
+    return total_size, object_count
+
+
+def _key_ranges(prefix: str, parts: int) -> List[Shard]:
+    """Split a prefix into `parts` key ranges at evenly spaced RANGE_ALPHABET characters."""
+    parts = min(max(1, parts), len(RANGE_ALPHABET))
+    step = len(RANGE_ALPHABET) / parts
+    bounds: List[Optional[str]] = [None]
+    bounds.extend(prefix + RANGE_ALPHABET[int(i * step)] for i in range(1, parts))
+    bounds.append(None)
+    return [(prefix, bounds[i], bounds[i + 1]) for i in range(parts)]
+
+
+def parallel_bucket_totals(s3_client, bucket_name: str, concurrency: int,
+                           prefix_stats: Optional[PrefixStats] = None) -> Tuple[int, int]:
+    """
+    Total size and object count of a bucket, listing shards concurrently.
+
+    Args:
+        s3_client: boto3 S3 client; clients are thread-safe, and its
+            connection pool should hold at least `concurrency` connections
+        bucket_name: Name of the S3 bucket
+        concurrency: Number of listing threads
+        prefix_stats: Optional accumulator; each shard fills its own and
+            they are merged into this one in shard order
+
+    Returns:
+        Tuple of (total_size, object_count)
+    """
+    total_size = 0
+    object_count = 0
+
+    # Discovery: objects found above the shard level are counted directly
+    prefixes = ['']
+    leaves: List[str] = []
+    for _ in range(MAX_SHARD_DEPTH):
+        if len(prefixes) + len(leaves) >= concurrency:
+            break
+        next_prefixes: List[str] = []
+        for prefix in prefixes:
+            level = _list_level(s3_client, bucket_name, prefix, prefix_stats)
+            if level is None:
+                leaves.append(prefix)
+                continue
+            children, size, count = level
+            next_prefixes.extend(children)
+            total_size += size
+            object_count += count
+        prefixes = next_prefixes
+        if not prefixes:
+            break
+    leaves.extend(prefixes)
+    leaves.sort()
+
+    # Too few leaves for the workers: list each in several key ranges
+    parts = -(-concurrency // len(leaves)) if leaves else 1
+    shards = [shard for prefix in leaves for shard in _key_ranges(prefix, parts)]
+
+    def run(shard: Shard) -> Tuple[int, int, Optional[PrefixStats]]:
+        shard_stats = None
+        if prefix_stats is not None:
+            shard_stats = PrefixStats(prefix_stats.depth, prefix_stats.capacity)
+        size, count = _list_shard(s3_client, bucket_name, shard, shard_stats)
+        return size, count, shard_stats
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        # map() yields results in input (sorted shard) order
+        for size, count, shard_stats in pool.map(run, shards):
+            total_size += size
+            object_count += count
+            if shard_stats is not None:
+                prefix_stats.merge(shard_stats)
+
+    if prefix_stats is not None:
+        prefix_stats.complete = True
+    print(f"Listed {bucket_name} in {len(shards)} shard(s) with {concurrency} worker(s)")
+    return total_size, object_count
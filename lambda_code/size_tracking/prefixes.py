@@ -0,0 +1,87 @@
+"""
+Per-prefix size accounting.
+
+PrefixStats accumulates (size, count) per key prefix in a single pass with a
+hard cap on the number of distinct prefixes it remembers, so memory stays
+bounded no matter how many keys a bucket holds. Prefixes first seen after
+the cap is reached are folded into a single 'other' total and the snapshot
+is marked truncated.
+"""
+
+import gzip
+import json
+from typing import Any, Dict, List
+
+
+def prefix_of(key: str, depth: int) -> str:
+    """
+    Return the first `depth` path segments of a key, with a trailing '/'.
+
+    Objects at the bucket root (or above the requested depth) map to their
+    deepest enclosing prefix; root objects map to ''.
+    """
+    dirs = key.split('/')[:-1]
+    if not dirs:
+        return ''
+    return '/'.join(dirs[:depth]) + '/'
+
+
+class PrefixStats:
+    def __init__(self, depth: int, capacity: int = 1000):
+        self.depth = depth
+        self.capacity = capacity
+        self.prefixes: Dict[str, List[int]] = {}
+        self.other_size = 0
+        self.other_count = 0
+        self.truncated = False
+        # Set by the producer once every key of the bucket has been added
+        self.complete = False
+
+    def add(self, key: str, size: int) -> None:
+        prefix = prefix_of(key, self.depth)
+        entry = self.prefixes.get(prefix)
+        if entry is None:
+            if len(self.prefixes) >= self.capacity:
+                self.truncated = True
+                self.other_size += size
+                self.other_count += 1
+                return
+            entry = self.prefixes[prefix] = [0, 0]
+        entry[0] += size
+        entry[1] += 1
+
+    def merge(self, other: 'PrefixStats') -> None:
+        """Fold another accumulator (e.g. from a parallel shard) into this one."""
+        # Sorted so the result does not depend on shard completion order
+        for prefix in sorted(other.prefixes):
+            size, count = other.prefixes[prefix]
+            entry = self.prefixes.get(prefix)
+            if entry is None and len(self.prefixes) >= self.capacity:
+                self.truncated = True
+                self.other_size += size
+                self.other_count += count
+                continue
+            if entry is None:
+                entry = self.prefixes[prefix] = [0, 0]
+            entry[0] += size
+            entry[1] += count
+        self.other_size += other.other_size
+        self.other_count += other.other_count
+        self.truncated = self.truncated or other.truncated
+
+    def to_item(self, bucket_name: str, timestamp: Any, key_suffix: str) -> Dict[str, Any]:
+        """
+        Build the compact snapshot item: summary attributes plus the full
+        prefix map as gzip-compressed JSON of {prefix: [size, count]}.
+        """
+        payload = json.dumps(self.prefixes, separators=(',', ':'), sort_keys=True)
+        return {
+            'bucket_name': bucket_name + key_suffix,
+            'timestamp': timestamp,
+            'depth': self.depth,
+            'prefix_count': len(self.prefixes),
+            'truncated': self.truncated,
+            'other_size': self.other_size,
+            'other_count': self.other_count,
+            'data': gzip.compress(payload.encode('utf-8')),
+        }
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Backfill the per-bucket stats items (historical high/low and last value)
+for size history that was recorded before the size-tracking lambda started
+maintaining them.
+
+The stats items are updated through the size-tracking lambda's own
+aggregates.update_bucket_stats, so running this against a live table never
+regresses values written in the meantime.
+
+Usage:
+    python3 scripts/backfill_bucket_stats.py [--table NAME] [--bucket NAME ...]
+"""
+
+import argparse
+import os
+import sys
+from typing import Any, Dict, Iterable, Optional
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_code', 'size_tracking'))
+
+from aggregates import update_bucket_stats  # noqa: E402
+
+
+def discover_buckets(table) -> Iterable[str]:
+    """Scan the table for tracked bucket names, skipping synthetic partitions."""
+    seen = set()
+    kwargs = {'ProjectionExpression': 'bucket_name'}
+    while True:
+        resp = table.scan(**kwargs)
+        for it in resp.get('Items', []):
+            name = it['bucket_name']
+            if '#' not in name and name not in seen:
+                seen.add(name)
+                yield name
+        lek = resp.get('LastEvaluatedKey')
+        if not lek:
+            break
+        kwargs['ExclusiveStartKey'] = lek
+
+
+def summarize_history(table, bucket: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Read a bucket's whole history partition and return its high, low and last rows."""
+    summary: Optional[Dict[str, Dict[str, Any]]] = None
+    kwargs = {
+        'KeyConditionExpression': Key('bucket_name').eq(bucket),
+        'ProjectionExpression': '#ts, total_size, object_count',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        'ScanIndexForward': True,
+    }
+    while True:
+        resp = table.query(**kwargs)
+        for it in resp.get('Items', []):
+            row = {
+                'bucket_name': bucket,
+                'timestamp': it['timestamp'],
+                'total_size': int(it.get('total_size', 0)),
+                'object_count': int(it.get('object_count', 0)),
+            }
+            if summary is None:
+                summary = {'high': row, 'low': row}
+            if row['total_size'] > summary['high']['total_size']:
+                summary['high'] = row
+            if row['total_size'] < summary['low']['total_size']:
+                summary['low'] = row
+            # Items arrive in timestamp order, so the last one wins
+            summary['last'] = row
+        lek = resp.get('LastEvaluatedKey')
+        if not lek:
+            break
+        kwargs['ExclusiveStartKey'] = lek
+    return summary
+
+
+def backfill_bucket(table, bucket: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    summary = summarize_history(table, bucket)
+    if summary is None:
+        return None
+
+    # Folding in just these rows sets the same high, low and last as
+    # replaying the whole history; oldest first, so the last row ends up last
+    rows = {row['timestamp']: row for row in summary.values()}
+    for timestamp in sorted(rows):
+        update_bucket_stats(table, rows[timestamp])
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default='S3-object-size-history', help='DynamoDB history table name')
+    parser.add_argument('--bucket', action='append', help='Bucket to backfill (default: all buckets in the table)')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb').Table(args.table)
+    buckets = args.bucket or discover_buckets(table)
+
+    for bucket in buckets:
+        summary = backfill_bucket(table, bucket)
+        if summary is None:
+            print(f"{bucket}: no history, skipped")
+        else:
+            print(f"{bucket}: high={summary['high']['total_size']} low={summary['low']['total_size']} "
+                  f"last={summary['last']['total_size']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Backfill the per-tier rollups for size history that was recorded before the
+size-tracking lambda started maintaining them.
+
+For each bucket and tier, every history row older than the tier's earliest
+existing rollup period is replayed through the size-tracking lambda's own
+aggregates.update_rollup, so the backfilled items match live ones. Periods
+that already have a rollup item are left alone: the live writer has started
+counting them, and replaying older rows into them would not be counted.
+
+Every replayed row costs one or more writes per tier; pass --tier to limit
+the backfill to the tiers the plots actually use.
+
+Usage:
+    python3 scripts/backfill_rollups.py [--table NAME] [--bucket NAME ...] [--tier NAME ...]
+"""
+
+import argparse
+import os
+import sys
+from typing import Any, Dict, Iterable, Optional
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_code', 'size_tracking'))
+
+from aggregates import ROLLUP_KEY_INFIX, ROLLUP_TIER_SECONDS, update_rollup  # noqa: E402
+
+from backfill_bucket_stats import discover_buckets  # noqa: E402
+
+
+def earliest_rollup(table, bucket: str, tier: str) -> Optional[int]:
+    """Start of the tier's earliest rollup period for a bucket, or None if it has none."""
+    resp = table.query(
+        KeyConditionExpression=Key('bucket_name').eq(bucket + ROLLUP_KEY_INFIX + tier),
+        ProjectionExpression='#ts',
+        ExpressionAttributeNames={'#ts': 'timestamp'},
+        ScanIndexForward=True,
+        Limit=1,
+    )
+    items = resp.get('Items', [])
+    return int(items[0]['timestamp']) if items else None
+
+
+def iter_history(table, bucket: str, before: Optional[int]) -> Iterable[Dict[str, Any]]:
+    """Yield a bucket's history rows in timestamp order, stopping at `before` (exclusive)."""
+    condition = Key('bucket_name').eq(bucket)
+    if before is not None:
+        condition = condition & Key('timestamp').lt(before)
+    kwargs = {
+        'KeyConditionExpression': condition,
+        'ProjectionExpression': '#ts, total_size, object_count',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        'ScanIndexForward': True,
+    }
+    while True:
+        resp = table.query(**kwargs)
+        for it in resp.get('Items', []):
+            yield {
+                'bucket_name': bucket,
+                'timestamp': it['timestamp'],
+                'total_size': int(it.get('total_size', 0)),
+                'object_count': int(it.get('object_count', 0)),
+            }
+        lek = resp.get('LastEvaluatedKey')
+        if not lek:
+            break
+        kwargs['ExclusiveStartKey'] = lek
+
+
+def backfill_bucket(table, bucket: str, tiers: Iterable[str]) -> Dict[str, int]:
+    """Replay a bucket's uncovered history into each tier; returns the rows replayed per tier."""
+    replayed = {}
+    for tier in tiers:
+        count = 0
+        for row in iter_history(table, bucket, earliest_rollup(table, bucket, tier)):
+            update_rollup(table, row, tier)
+            count += 1
+        replayed[tier] = count
+    return replayed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default='S3-object-size-history', help='DynamoDB history table name')
+    parser.add_argument('--bucket', action='append', help='Bucket to backfill (default: all buckets in the table)')
+    parser.add_argument('--tier', action='append', choices=sorted(ROLLUP_TIER_SECONDS),
+                        help='Rollup tier to backfill (default: all tiers)')
+    args = parser.parse_args()
+
+    table = boto3.resource('dynamodb').Table(args.table)
+    buckets = args.bucket or discover_buckets(table)
+    tiers = args.tier or list(ROLLUP_TIER_SECONDS)
+
+    for bucket in buckets:
+        replayed = backfill_bucket(table, bucket, tiers)
+        print(f"{bucket}: " + ' '.join(f"{tier}={count}" for tier, count in replayed.items()))
+
+
+if __name__ == '__main__':
+    main()
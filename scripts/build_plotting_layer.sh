@@ -0,0 +1,35 @@
+#!/bin/bash
+# Build the matplotlib Lambda layer with a pre-generated font cache
+
+set -e
+
+LAYER_DIR="$(cd "$(dirname "$0")/../.." && pwd)/layer_build"
+MATPLOTLIB_VERSION="${MATPLOTLIB_VERSION:-3.7.5}"
+
+echo "=========================================="
+echo "  Building matplotlib layer"
+echo "=========================================="
+
+if ! command -v docker &> /dev/null; then
+    echo "❌ Docker not found. It is needed to build Linux wheels at the /opt paths used by Lambda"
+    exit 1
+fi
+
+rm -rf "$LAYER_DIR/python" "$LAYER_DIR/layer.zip"
+mkdir -p "$LAYER_DIR"
+
+# Build inside the Lambda image with the layer mounted at /opt, so the font
+# cache records the same font paths the function will see at runtime.
+# The plotting function copies python/mplconfig to /tmp on first render.
+docker run --rm \
+  -v "$LAYER_DIR":/opt \
+  --entrypoint /bin/bash \
+  public.ecr.aws/lambda/python:3.9 \
+  -c "pip install -q --target /opt/python matplotlib==$MATPLOTLIB_VERSION \
+      && MPLCONFIGDIR=/opt/python/mplconfig PYTHONPATH=/opt/python \
+         python -c 'import matplotlib; matplotlib.use(\"Agg\"); import matplotlib.pyplot; matplotlib.font_manager.findfont(\"DejaVu Sans\")' \
+      && find /opt/python -name '__pycache__' -prune -o -name 'tests' -type d -prune -exec rm -rf {} +"
+
+(cd "$LAYER_DIR" && zip -qr layer.zip python)
+
+echo "✅ Layer written to $LAYER_DIR/layer.zip"
@@ -16,8 +16,18 @@ LAMBDA_ARN=$(aws lambda list-functions \
   --query 'Functions[?contains(FunctionName, `SizeTrackingFunction`)].FunctionArn' \
   --output text)
 
+# SQS buffer queue, if deployed with -c event_buffer=sqs
+QUEUE_ARN=$(aws cloudformation describe-stacks \
+  --stack-name S3SizeTrackingSizeTrackingStack \
+  --query 'Stacks[0].Outputs[?OutputKey==`QueueArnOutput`].OutputValue' \
+  --output text 2>/dev/null || true)
+if [ "$QUEUE_ARN" == "None" ]; then
+  QUEUE_ARN=""
+fi
+
 echo "Bucket: $BUCKET"
 echo "Lambda ARN: $LAMBDA_ARN"
+echo "Queue ARN: ${QUEUE_ARN:-none}"
 
 # Add Lambda permission for S3 to invoke it
 aws lambda add-permission \
@@ -28,7 +38,19 @@ aws lambda add-permission \
   --source-arn "arn:aws:s3:::$BUCKET" \
   || echo "Permission already exists"
 
-# Configure S3 event notification
+# Configure S3 event notification (to the queue when one is deployed)
+if [ -n "$QUEUE_ARN" ]; then
+cat > /tmp/s3-notification.json << EOF
+{
+  "QueueConfigurations": [
+    {
+      "QueueArn": "$QUEUE_ARN",
+      "Events": ["s3:ObjectCreated:*", "s3:ObjectRemoved:*"]
+    }
+  ]
+}
+EOF
+else
 cat > /tmp/s3-notification.json << EOF
 {
   "LambdaFunctionConfigurations": [
@@ -39,6 +61,7 @@ cat > /tmp/s3-notification.json << EOF
   ]
 }
 EOF
+fi
 
 aws s3api put-bucket-notification-configuration \
   --bucket "$BUCKET" \
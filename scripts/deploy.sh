@@ -23,7 +23,7 @@ fi
 
 if [ ! -f "../layer_build/layer.zip" ]; then
     echo "⚠️  Warning: matplotlib layer not found at ../layer_build/layer.zip"
-    echo "   You may need to build it first"
+    echo "   Build it with: scripts/build_plotting_layer.sh"
 fi
 
 echo "✅ Prerequisites check passed"
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Merge sampled Lambda profiles into one collapsed-stack file.
+
+Profiles are the gzipped collapsed stacks written by the shared profiler
+(lambda_code/shared/python/profiling.py) under the profile prefix of the
+tracked bucket. Inputs may be local files, local directories or s3://
+prefixes; counts of identical stacks are summed. The output feeds
+flamegraph.pl or speedscope directly:
+
+Usage:
+    python3 scripts/merge_profiles.py s3://<bucket>/_profiles/<function>/2026-10-18/ -o plot.collapsed
+    python3 scripts/merge_profiles.py profiles/ --merge-threads --top 20 | flamegraph.pl > plot.svg
+"""
+
+import argparse
+import gzip
+import os
+import sys
+from collections import Counter
+from typing import Iterator, Tuple
+from urllib.parse import urlparse
+
+PROFILE_SUFFIX = '.collapsed.gz'
+
+
+def _iter_sources(source: str) -> Iterator[bytes]:
+    """Yield the raw bytes of every profile under an s3:// prefix, directory or file."""
+    if source.startswith('s3://'):
+        import boto3
+        url = urlparse(source)
+        s3 = boto3.client('s3')
+        paginator = s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=url.netloc, Prefix=url.path.lstrip('/')):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith(PROFILE_SUFFIX):
+                    yield s3.get_object(Bucket=url.netloc, Key=obj['Key'])['Body'].read()
+    elif os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.endswith(PROFILE_SUFFIX) or name.endswith('.collapsed'):
+                    with open(os.path.join(root, name), 'rb') as f:
+                        yield f.read()
+    else:
+        with open(source, 'rb') as f:
+            yield f.read()
+
+
+def parse_collapsed(data: bytes) -> Counter:
+    """Parse collapsed-stack text, gzipped or not."""
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    stacks: Counter = Counter()
+    for line in data.decode('utf-8').splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack and count.isdigit():
+            stacks[stack] += int(count)
+    return stacks
+
+
+def merge(sources, merge_threads: bool = False) -> Tuple[Counter, int]:
+    """Sum the stacks of all profiles; returns (stacks, number of profiles read)."""
+    merged: Counter = Counter()
+    profiles = 0
+    for source in sources:
+        for data in _iter_sources(source):
+            for stack, count in parse_collapsed(data).items():
+                if merge_threads:
+                    # The outermost frame is the thread name; pool thread names vary
+                    stack = stack.partition(';')[2] or stack
+                merged[stack] += count
+            profiles += 1
+    return merged, profiles
+
+
+def top_frames(stacks: Counter, limit: int) -> Iterator[Tuple[str, int, int]]:
+    """Yield (frame, self samples, total samples) for the frames with the most self time."""
+    self_samples: Counter = Counter()
+    total_samples: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        self_samples[frames[-1]] += count
+        # A recursive frame counts once per stack towards its total
+        for frame in set(frames):
+            total_samples[frame] += count
+    for frame, count in self_samples.most_common(limit):
+        yield frame, count, total_samples[frame]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='Profile files, directories or s3:// prefixes')
+    parser.add_argument('-o', '--output', help='Write merged stacks here instead of stdout')
+    parser.add_argument('--merge-threads', action='store_true',
+                        help='Drop the thread-name root frame so all threads merge into one graph')
+    parser.add_argument('--top', type=int, default=0, help='Print the N frames with the most self samples')
+    args = parser.parse_args()
+
+    stacks, profiles = merge(args.sources, args.merge_threads)
+    if not profiles:
+        sys.exit('No profiles found')
+
+    text = ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+    total = sum(stacks.values())
+    print(f"Merged {profiles} profile(s), {total} samples, {len(stacks)} distinct stacks", file=sys.stderr)
+    for frame, own, inclusive in top_frames(stacks, args.top):
+        print(f"{own / total:7.1%} self {inclusive / total:7.1%} total  {frame}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -45,12 +45,22 @@ fi
 
 echo "✅ Driver Function: $DRIVER_FUNCTION"
 
-# Update environment variables
+# Update environment variables, keeping the others set by CDK (TABLE_NAME, ...)
 echo ""
 echo "Updating environment variables..."
+ENVIRONMENT=$(aws lambda get-function-configuration \
+  --function-name "$DRIVER_FUNCTION" \
+  --query 'Environment.Variables' \
+  --output json \
+  | API_URL="$API_URL" BUCKET_NAME="$BUCKET_NAME" python3 -c '
+import json, os, sys
+variables = json.load(sys.stdin) or {}
+variables.update(BUCKET_NAME=os.environ["BUCKET_NAME"], PLOTTING_API_URL=os.environ["API_URL"])
+print(json.dumps({"Variables": variables}))
+')
 aws lambda update-function-configuration \
   --function-name "$DRIVER_FUNCTION" \
-  --environment "Variables={BUCKET_NAME=$BUCKET_NAME,PLOTTING_API_URL=$API_URL}" \
+  --environment "$ENVIRONMENT" \
   > /dev/null
 
 echo ""
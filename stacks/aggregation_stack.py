@@ -0,0 +1,83 @@
+"""
+Aggregation Stack - DynamoDB Streams Consumer
+Creates the Lambda function that maintains derived aggregates asynchronously.
+"""
+
+from aws_cdk import (
+    Stack,
+    Duration,
+    aws_lambda as lambda_,
+    aws_dynamodb as dynamodb,
+    aws_s3 as s3,
+    aws_lambda_event_sources as event_sources,
+)
+from constructs import Construct
+
+from stacks.shared_layer import configure_profiling, shared_code_layer
+
+
+class AggregationStack(Stack):
+    """
+    Creates aggregation Lambda function:
+    - Consumes the history table's stream (inserted or replaced history rows only)
+    - Updates the per-bucket stats item and rollups
+    - Reports partial batch failures so retries resume at the failed record
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        table: dynamodb.Table,
+        bucket: s3.IBucket,
+        profile_sample_rate: float = 0,
+        **kwargs
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        # Shares its code with the size-tracking function (aggregates module)
+        self.lambda_function = lambda_.Function(
+            self,
+            "AggregationFunction",
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            handler="stream_consumer.lambda_handler",
+            code=lambda_.Code.from_asset("lambda_code/size_tracking"),
+            timeout=Duration.minutes(1),
+            memory_size=256,
+            layers=[shared_code_layer(self)],
+            environment={
+                "TABLE_NAME": table.table_name,
+                "ROLLUP_TIERS": "minute,hour,day",
+            },
+            description="Maintains size history aggregates from the DynamoDB stream",
+        )
+
+        self.lambda_function.add_event_source(
+            event_sources.DynamoEventSource(
+                table,
+                starting_position=lambda_.StartingPosition.TRIM_HORIZON,
+                batch_size=100,
+                max_batching_window=Duration.seconds(1),
+                bisect_batch_on_error=True,
+                retry_attempts=10,
+                report_batch_item_failures=True,
+                # Only history rows carry recorded_at; derived items written
+                # by this function must not re-trigger it. MODIFY is a history
+                # row replaced by a later write in the same second.
+                filters=[
+                    lambda_.FilterCriteria.filter({
+                        "eventName": lambda_.FilterRule.or_("INSERT", "MODIFY"),
+                        "dynamodb": {
+                            "NewImage": {
+                                "recorded_at": {"S": lambda_.FilterRule.exists()},
+                            },
+                        },
+                    }),
+                ],
+            )
+        )
+
+        # Grant permissions
+        table.grant_write_data(self.lambda_function)
+        # The tracked bucket only receives this function's profiles
+        configure_profiling(self.lambda_function, bucket, profile_sample_rate)
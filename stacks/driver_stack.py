@@ -8,15 +8,19 @@ from aws_cdk import (
     Duration,
     aws_lambda as lambda_,
     aws_s3 as s3,
+    aws_dynamodb as dynamodb,
 )
 from constructs import Construct
 
+from stacks.shared_layer import configure_profiling, shared_code_layer
+
 
 class DriverStack(Stack):
     """
     Creates driver Lambda function:
     - Performs S3 operations (create/update/delete)
     - Calls plotting API
+    - Runs load scenarios (see lambda_code/driver/scenario.py)
     - Used for testing the entire system
     """
 
@@ -25,7 +29,9 @@ class DriverStack(Stack):
         scope: Construct,
         construct_id: str,
         bucket: s3.IBucket,
+        table: dynamodb.ITable,
         api_url: str,
+        profile_sample_rate: float = 0,
         **kwargs
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
@@ -37,10 +43,16 @@ class DriverStack(Stack):
             runtime=lambda_.Runtime.PYTHON_3_9,
             handler="index.lambda_handler",
             code=lambda_.Code.from_asset("lambda_code/driver"),
-            timeout=Duration.minutes(2),
-            memory_size=256,
+            # Load scenarios run for minutes; smoke tests stop well before this
+            timeout=Duration.minutes(15),
+            # Worker threads each hold an object body in memory
+            memory_size=512,
+            layers=[shared_code_layer(self)],
             environment={
                 "BUCKET_NAME": bucket.bucket_name,
+                # Polled for the history rows each step should produce
+                "TABLE_NAME": table.table_name,
+                "POLL_TIMEOUT_SECONDS": "30",
                 # API URL will be set after deployment
                 "PLOTTING_API_URL": "PLACEHOLDER",  # Update after deployment
             },
@@ -50,4 +62,6 @@ class DriverStack(Stack):
         # Grant permissions
         bucket.grant_read_write(self.lambda_function)
         bucket.grant_delete(self.lambda_function)
+        table.grant_read_data(self.lambda_function)
+        configure_profiling(self.lambda_function, bucket, profile_sample_rate)
 
@@ -6,6 +6,7 @@ Creates the Lambda function that generates matplotlib plots.
 from aws_cdk import (
     Stack,
     Duration,
+    Size,
     aws_lambda as lambda_,
     aws_s3 as s3,
     aws_dynamodb as dynamodb,
@@ -13,11 +14,13 @@ from aws_cdk import (
 )
 from constructs import Construct
 
+from stacks.shared_layer import configure_profiling, shared_code_layer
+
 
 class PlottingStack(Stack):
     """
     Creates plotting Lambda function:
-    - Generates matplotlib plots from DynamoDB data
+    - Generates plots from DynamoDB data (matplotlib, SVG or PNG backend)
     - Exposed via REST API Gateway
     - Uses Lambda layer for matplotlib dependencies
     """
@@ -28,6 +31,8 @@ class PlottingStack(Stack):
         construct_id: str,
         bucket: s3.IBucket,
         table: dynamodb.ITable,
+        renderer: str = "matplotlib",
+        profile_sample_rate: float = 0,
         **kwargs
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
@@ -51,12 +56,29 @@ class PlottingStack(Stack):
             handler="index.lambda_handler",
             code=lambda_.Code.from_asset("lambda_code/plotting"),
             timeout=Duration.minutes(1),
-            memory_size=512,  # matplotlib needs more memory
-            layers=[matplotlib_layer],
+            # matplotlib needs more memory; the svg/png backends fit comfortably in 256 MB
+            memory_size=512 if renderer == "matplotlib" else 256,
+            layers=[matplotlib_layer, shared_code_layer(self)],
             environment={
                 "TABLE_NAME": table.table_name,
                 "BUCKET_NAME": bucket.bucket_name,
                 "WINDOW_SECONDS": "20",
+                "RENDER_CACHE_SIZE": "16",
+                # Default backend; ?renderer=matplotlib|svg|png overrides per request
+                "RENDERER": renderer,
+                # Long windows are reduced to MAX_POINTS with lttb|minmax|none
+                "DOWNSAMPLE": "lttb",
+                "MAX_POINTS": "1000",
+                # Rollups written by size tracking; windows long enough use them automatically
+                "ROLLUP_TIERS": "minute,hour,day",
+                "ROLLUP_MIN_POINTS": "200",
+                # /dashboard: parallel bucket reads and the time budget for them
+                "DASHBOARD_CONCURRENCY": "8",
+                "DASHBOARD_BUDGET_SECONDS": "20",
+                # Default /series page size, overridable with ?limit=
+                "SERIES_PAGE_SIZE": "1000",
+                # Set to "1" to report import/init phase timings per cold start
+                "STARTUP_TIMING": "0",
             },
             description="Generates matplotlib plots of bucket size history",
         )
@@ -64,6 +86,9 @@ class PlottingStack(Stack):
         # Grant permissions
         table.grant_read_data(self.lambda_function)
         bucket.grant_put(self.lambda_function)
+        # HeadObject on the plot to skip re-uploading an unchanged render
+        bucket.grant_read(self.lambda_function, "plot")
+        configure_profiling(self.lambda_function, bucket, profile_sample_rate)
 
         # Create REST API
         api = apigateway.RestApi(
@@ -76,6 +101,9 @@ class PlottingStack(Stack):
                 throttling_rate_limit=10,
                 throttling_burst_limit=20,
             ),
+            # Gzips responses of 1 KB or more (mostly /series) for clients
+            # sending Accept-Encoding: gzip
+            min_compression_size=Size.kibibytes(1),
         )
 
         # Create /plot resource
@@ -90,6 +118,36 @@ class PlottingStack(Stack):
             ),
         )
 
+        # Create /prefixes resource (top prefixes by size and growth), same function
+        prefixes_resource = api.root.add_resource("prefixes")
+        prefixes_resource.add_method(
+            "GET",
+            apigateway.LambdaIntegration(
+                self.lambda_function,
+                proxy=True,
+            ),
+        )
+
+        # Create /series resource (points as JSON or CSV, no rendering), same function
+        series_resource = api.root.add_resource("series")
+        series_resource.add_method(
+            "GET",
+            apigateway.LambdaIntegration(
+                self.lambda_function,
+                proxy=True,
+            ),
+        )
+
+        # Create /dashboard resource (many buckets per request), same function
+        dashboard_resource = api.root.add_resource("dashboard")
+        dashboard_resource.add_method(
+            "GET",
+            apigateway.LambdaIntegration(
+                self.lambda_function,
+                proxy=True,
+            ),
+        )
+
         # Store API URL for cross-stack reference
         self.api_url = f"{api.url}plot"
 
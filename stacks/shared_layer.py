@@ -0,0 +1,45 @@
+"""
+Shared Code Layer
+Packages lambda_code/shared (instrumentation and profiling) as a Lambda layer.
+"""
+
+from aws_cdk import (
+    aws_lambda as lambda_,
+    aws_s3 as s3,
+)
+from constructs import Construct
+
+# Profiles land under this prefix of the tracked bucket; size tracking ignores it
+PROFILE_PREFIX = "_profiles/"
+
+
+def shared_code_layer(scope: Construct) -> lambda_.LayerVersion:
+    """
+    Create the shared-code layer in the given stack.
+
+    Layer contents land in /opt, and /opt/python is on the Lambda
+    runtime's sys.path, so functions import the modules directly. Each
+    stack creates its own copy; the asset is uploaded once either way.
+    """
+    return lambda_.LayerVersion(
+        scope,
+        "SharedCodeLayer",
+        code=lambda_.Code.from_asset("lambda_code/shared"),
+        compatible_runtimes=[lambda_.Runtime.PYTHON_3_9],
+        description="Instrumentation and profiling shared by the size tracking functions",
+    )
+
+
+def configure_profiling(function: lambda_.Function, bucket: s3.IBucket, sample_rate: float) -> None:
+    """
+    Point a function's sampling profiler at the tracked bucket.
+
+    The prefix is always set so size tracking knows what to ignore; write
+    access to it is only granted when profiling is switched on.
+    """
+    function.add_environment("PROFILE_PREFIX", PROFILE_PREFIX)
+    function.add_environment("PROFILE_BUCKET", bucket.bucket_name)
+    # Fraction of invocations stack-sampled; "0" disables profiling
+    function.add_environment("PROFILE_SAMPLE_RATE", str(sample_rate))
+    if sample_rate > 0:
+        bucket.grant_put(function, PROFILE_PREFIX + "*")
@@ -9,9 +9,16 @@ from aws_cdk import (
     aws_lambda as lambda_,
     aws_s3 as s3,
     aws_dynamodb as dynamodb,
+    aws_events as events,
+    aws_events_targets as targets,
+    aws_iam as iam,
+    aws_lambda_event_sources as event_sources,
+    aws_sqs as sqs,
 )
 from constructs import Construct
 
+from stacks.shared_layer import configure_profiling, shared_code_layer
+
 
 class SizeTrackingStack(Stack):
     """
@@ -27,10 +34,42 @@ class SizeTrackingStack(Stack):
         construct_id: str,
         bucket: s3.IBucket,
         table: dynamodb.ITable,
+        tracking_mode: str = "full",
+        aggregation_mode: str = "inline",
+        prefix_depth: int = 0,
+        recount_concurrency: int = 1,
+        coalesce_interval: int = 0,
+        event_buffer: str = "direct",
+        queue_batch_size: int = 100,
+        queue_batching_window: int = 5,
+        timestamp_precision: int = 0,
+        profile_sample_rate: float = 0,
         **kwargs
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        environment = {
+            "TABLE_NAME": table.table_name,
+            # "incremental" applies per-event deltas instead of re-listing the bucket
+            "TRACKING_MODE": tracking_mode,
+            "RECOUNT_INTERVAL_SECONDS": "3600",
+            # Above 1, full listings are split into prefix shards listed concurrently
+            "RECOUNT_CONCURRENCY": str(recount_concurrency),
+            # min/max/last/count per bucket per tier, read by the plotting lambda
+            "ROLLUP_TIERS": "minute,hour,day",
+            # "stream" leaves aggregates to the AggregationStack consumer
+            "AGGREGATION_MODE": aggregation_mode,
+            # Per-prefix snapshots for /prefixes; "0" disables
+            "PREFIX_DEPTH": str(prefix_depth),
+            # Minimum seconds between history rows per bucket; "0" writes every batch
+            "COALESCE_INTERVAL_SECONDS": str(coalesce_interval),
+            # Fractional digits of history sort keys (3 = ms); "0" keeps whole seconds
+            "TIMESTAMP_PRECISION": str(timestamp_precision),
+        }
+
+        # Instrumentation module, shared by every function in the app
+        shared_layer = shared_code_layer(self)
+
         # Create Lambda function
         self.lambda_function = lambda_.Function(
             self,
@@ -40,13 +79,83 @@ class SizeTrackingStack(Stack):
             code=lambda_.Code.from_asset("lambda_code/size_tracking"),
             timeout=Duration.minutes(1),
             memory_size=256,
-            environment={
-                "TABLE_NAME": table.table_name,
-            },
+            layers=[shared_layer],
+            environment=environment,
             description="Tracks S3 bucket size changes and records to DynamoDB",
         )
 
         # Grant permissions
         bucket.grant_read(self.lambda_function)
-        table.grant_write_data(self.lambda_function)
+        configure_profiling(self.lambda_function, bucket, profile_sample_rate)
+        # Incremental mode reads back remembered object sizes and running totals
+        table.grant_read_write_data(self.lambda_function)
+
+        # Optional SQS buffer: S3 notifications go to a queue that feeds the
+        # function in batches, with retries and a dead-letter queue
+        self.queue = None
+        if event_buffer == "sqs":
+            self.dead_letter_queue = sqs.Queue(
+                self,
+                "SizeTrackingDeadLetterQueue",
+                retention_period=Duration.days(14),
+            )
+            self.queue = sqs.Queue(
+                self,
+                "SizeTrackingQueue",
+                # At least six times the function timeout, as recommended for Lambda sources
+                visibility_timeout=Duration.minutes(6),
+                dead_letter_queue=sqs.DeadLetterQueue(
+                    max_receive_count=5,
+                    queue=self.dead_letter_queue,
+                ),
+            )
+            self.queue.add_to_resource_policy(iam.PolicyStatement(
+                actions=["sqs:SendMessage"],
+                principals=[iam.ServicePrincipal("s3.amazonaws.com")],
+                resources=[self.queue.queue_arn],
+                conditions={"ArnLike": {"aws:SourceArn": bucket.bucket_arn}},
+            ))
+            self.lambda_function.add_event_source(
+                event_sources.SqsEventSource(
+                    self.queue,
+                    batch_size=queue_batch_size,
+                    # Trades latency for throughput; batches above 10 require a window
+                    max_batching_window=Duration.seconds(queue_batching_window),
+                    report_batch_item_failures=True,
+                )
+            )
+
+        # Coalescing defers rows inside the interval; the scheduled flush makes
+        # sure the last deferred state of every bucket is recorded
+        if coalesce_interval > 0:
+            flush_rule = events.Rule(
+                self,
+                "CoalesceFlushRule",
+                schedule=events.Schedule.rate(Duration.minutes(1)),
+                description="Flushes deferred size snapshots",
+            )
+            flush_rule.add_target(targets.LambdaFunction(
+                self.lambda_function,
+                event=events.RuleTargetInput.from_object({"flush": True}),
+            ))
+
+        # Bulk reconciliation from S3 Inventory reports, invoked on demand with
+        # {"manifest": "s3://<destination>/<path>/manifest.json"}
+        self.inventory_function = lambda_.Function(
+            self,
+            "InventoryReconcileFunction",
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            handler="inventory.lambda_handler",
+            code=lambda_.Code.from_asset("lambda_code/size_tracking"),
+            timeout=Duration.minutes(15),
+            memory_size=512,
+            layers=[shared_layer],
+            environment=environment,
+            description="Reconciles bucket size history against S3 Inventory reports",
+        )
 
+        # Inventory reports are usually delivered to the tracked bucket;
+        # grant read on the destination bucket too if it is a separate one
+        bucket.grant_read(self.inventory_function)
+        table.grant_read_write_data(self.inventory_function)
+        configure_profiling(self.inventory_function, bucket, profile_sample_rate)
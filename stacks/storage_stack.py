@@ -19,7 +19,13 @@ class StorageStack(Stack):
     - DynamoDB table for storing size history with GSI
     """
 
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        enable_stream: bool = False,
+        **kwargs
+    ) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
         # Create S3 bucket
@@ -58,9 +64,17 @@ class StorageStack(Stack):
             removal_policy=RemovalPolicy.DESTROY,
             # Point-in-time recovery
             point_in_time_recovery=False,
+            # Expires tombstones written by incremental size tracking
+            time_to_live_attribute="expires_at",
+            # New history rows feed the optional aggregation stack
+            stream=dynamodb.StreamViewType.NEW_IMAGE if enable_stream else None,
         )
 
-        # Add Global Secondary Index for time-based queries across all buckets
+        # Add Global Secondary Index for time-based queries across all buckets.
+        # The derived items (#state, #obj#<key>, #stats, ...) all use
+        # timestamp 0 and share one index partition. Re-keying it needs two
+        # deploys: CloudFormation cannot delete one GSI and create another in
+        # the same table update.
         self.table.add_global_secondary_index(
             index_name="timestamp-index",
             partition_key=dynamodb.Attribute(
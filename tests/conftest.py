@@ -0,0 +1,104 @@
+"""
+Shared fixtures: a moto-backed history table and tracked bucket, and the
+Lambda modules loaded with the import paths their runtime gives them.
+
+The size-tracking and plotting handlers are both 'index' modules, so each
+is loaded from its file under its own name.
+"""
+
+import importlib.util
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(ROOT, 'lambda_code')
+
+TABLE_NAME = 'size-history-test'
+BUCKET_NAME = 'tracked-bucket'
+
+# Never reach a real account, whatever the shell has configured
+os.environ.update({
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing',
+    'AWS_SESSION_TOKEN': 'testing',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'TABLE_NAME': TABLE_NAME,
+    'BUCKET_NAME': BUCKET_NAME,
+    'METRICS_ENABLED': '0',
+})
+os.environ.pop('AWS_PROFILE', None)
+
+# The shared layer and each function's own directory, as on Lambda
+for path in ('shared/python', 'size_tracking', 'plotting'):
+    sys.path.insert(0, os.path.join(LAMBDA_DIR, path))
+
+_modules = {}
+
+
+def _load(name: str, relative_path: str):
+    if name not in _modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(LAMBDA_DIR, relative_path))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[name] = module
+    return _modules[name]
+
+
+@pytest.fixture
+def aws():
+    with mock_aws():
+        yield
+
+
+@pytest.fixture
+def table(aws):
+    """The history table, keyed like the StorageStack one."""
+    return boto3.resource('dynamodb').create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[
+            {'AttributeName': 'bucket_name', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'},
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'bucket_name', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'N'},
+        ],
+        BillingMode='PAY_PER_REQUEST',
+    )
+
+
+@pytest.fixture
+def s3(aws):
+    client = boto3.client('s3')
+    client.create_bucket(Bucket=BUCKET_NAME)
+    return client
+
+
+@pytest.fixture
+def size_tracking(monkeypatch):
+    """The size-tracking handler module with the deployment defaults."""
+    module = _load('size_tracking_index', 'size_tracking/index.py')
+    monkeypatch.setattr(module, 'TRACKING_MODE', 'full')
+    monkeypatch.setattr(module, 'COALESCE_INTERVAL_SECONDS', 0)
+    monkeypatch.setattr(module, 'TIMESTAMP_PRECISION', 0)
+    monkeypatch.setattr(module, 'AGGREGATION_MODE', 'inline')
+    monkeypatch.setattr(module, 'PREFIX_DEPTH', 0)
+    return module
+
+
+@pytest.fixture
+def stream_consumer():
+    return _load('stream_consumer', 'size_tracking/stream_consumer.py')
+
+
+@pytest.fixture
+def plotting(monkeypatch):
+    """The plotting handler module with empty per-container caches."""
+    module = _load('plotting_index', 'plotting/index.py')
+    monkeypatch.setattr(module, '_render_cache', type(module._render_cache)())
+    monkeypatch.setattr(module, '_partition_starts', {})
+    return module
@@ -0,0 +1,38 @@
+"""Builders for the S3 notification and SQS events the size-tracking handler receives."""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from conftest import BUCKET_NAME
+
+
+def s3_record(key: str, event_name: str = 'ObjectCreated:Put', size: int = 0,
+              sequencer: Optional[str] = None, bucket: str = BUCKET_NAME,
+              event_time: str = '2024-01-01T00:00:00.000Z') -> Dict[str, Any]:
+    s3_object: Dict[str, Any] = {'key': key}
+    if event_name.startswith('ObjectCreated'):
+        s3_object['size'] = size
+    if sequencer:
+        s3_object['sequencer'] = sequencer
+    return {
+        'eventSource': 'aws:s3',
+        'eventName': event_name,
+        'eventTime': event_time,
+        's3': {'bucket': {'name': bucket}, 'object': s3_object},
+    }
+
+
+def s3_event(*records: Dict[str, Any]) -> Dict[str, Any]:
+    return {'Records': list(records)}
+
+
+def sqs_event(messages: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """SQS batch with one message per id, each carrying an S3 notification of the given records."""
+    return {'Records': [
+        {
+            'messageId': message_id,
+            'eventSource': 'aws:sqs',
+            'body': json.dumps({'Records': records}),
+        }
+        for message_id, records in messages.items()
+    ]}
@@ -0,0 +1,109 @@
+"""Coalescing: deferred events survive a failure after they were taken."""
+
+import itertools
+
+import pytest
+from boto3.dynamodb.conditions import Key
+
+from coalesce import record_pending, restore_pending, take_pending
+from conftest import BUCKET_NAME
+from s3_events import s3_event, s3_record, sqs_event
+
+INTERVAL = 60
+
+
+@pytest.fixture
+def coalescing(size_tracking, table, s3, monkeypatch):
+    monkeypatch.setattr(size_tracking, 'COALESCE_INTERVAL_SECONDS', INTERVAL)
+    # One second per row, so rows never replace each other
+    monkeypatch.setattr(size_tracking, 'history_timestamp', itertools.count(1700000000).__next__)
+    s3.put_object(Bucket=BUCKET_NAME, Key='a.txt', Body=b'x' * 10)
+    return size_tracking
+
+
+def defer_one_event(handler, table):
+    """Persist one row, then defer a second event inside the interval."""
+    first = handler.lambda_handler(s3_event(s3_record('a.txt', event_time='2024-01-01T00:00:01.000Z')), None)
+    assert first['statusCode'] == 200
+    second = handler.lambda_handler(s3_event(s3_record('a.txt', event_time='2024-01-01T00:00:02.000Z')), None)
+    assert '"deferred": ["%s"]' % BUCKET_NAME in second['body']
+
+
+def elapse_interval(table):
+    table.update_item(
+        Key={'bucket_name': BUCKET_NAME + '#state', 'timestamp': 0},
+        UpdateExpression='SET last_persisted_at = :long_ago',
+        ExpressionAttributeValues={':long_ago': 0},
+    )
+
+
+def pending_item(table):
+    return table.get_item(Key={'bucket_name': BUCKET_NAME + '#pending', 'timestamp': 0}).get('Item')
+
+
+def registered(table):
+    item = table.get_item(Key={'bucket_name': '#coalesce', 'timestamp': 0}).get('Item', {})
+    return item.get('pending_buckets', set())
+
+
+def history(table):
+    return table.query(KeyConditionExpression=Key('bucket_name').eq(BUCKET_NAME))['Items']
+
+
+def failing_write(monkeypatch, handler):
+    def write_to_dynamodb(items, snapshots=None, unique=False):
+        raise RuntimeError('throttled')
+    monkeypatch.setattr(handler, 'write_to_dynamodb', write_to_dynamodb)
+
+
+def test_failed_flush_write_restores_the_pending_events(coalescing, table, monkeypatch):
+    defer_one_event(coalescing, table)
+    elapse_interval(table)
+
+    with monkeypatch.context() as m:
+        failing_write(m, coalescing)
+        response = coalescing.lambda_handler({'flush': True}, None)
+    assert response['statusCode'] == 500
+    assert int(pending_item(table)['event_count']) == 1
+    assert pending_item(table)['last_event_time'] == '2024-01-01T00:00:02.000Z'
+    assert registered(table) == {BUCKET_NAME}
+
+    elapse_interval(table)
+    response = coalescing.lambda_handler({'flush': True}, None)
+    assert response['statusCode'] == 200
+    assert pending_item(table) is None
+    assert registered(table) == set()
+    # The first row was persisted directly, the second carries the deferred event
+    rows = history(table)
+    assert [int(row['event_count']) for row in rows] == [1, 1]
+    assert [row['last_event_time'] for row in rows] == ['2024-01-01T00:00:01.000Z', '2024-01-01T00:00:02.000Z']
+
+
+def test_failed_queued_batch_restores_the_pending_events(coalescing, table, monkeypatch):
+    defer_one_event(coalescing, table)
+    elapse_interval(table)
+
+    def build_history_item(bucket_name, records, pending=None):
+        raise RuntimeError('throttled')
+    monkeypatch.setattr(coalescing, 'build_history_item', build_history_item)
+    response = coalescing.lambda_handler(sqs_event({'m1': [s3_record('a.txt')]}), None)
+
+    assert [f['itemIdentifier'] for f in response['batchItemFailures']] == ['m1']
+    assert int(pending_item(table)['event_count']) == 1
+    assert registered(table) == {BUCKET_NAME}
+
+
+def test_restore_keeps_events_deferred_after_the_take(coalescing, table):
+    record_pending(table, BUCKET_NAME, [s3_record('a.txt', event_time='2024-01-01T00:00:01.000Z')], 100)
+    taken = take_pending(table, BUCKET_NAME)
+    # Deferred while the taken events were being written
+    record_pending(table, BUCKET_NAME, [s3_record('a.txt', 'ObjectRemoved:Delete',
+                                                  event_time='2024-01-01T00:00:05.000Z')] * 2, 200)
+    restore_pending(table, BUCKET_NAME, taken)
+
+    item = pending_item(table)
+    assert int(item['event_count']) == 3
+    assert int(item['pending_since']) == 100
+    assert item['triggered_by'] == 'ObjectRemoved:Delete'
+    assert item['last_event_time'] == '2024-01-01T00:00:05.000Z'
+    assert registered(table) == {BUCKET_NAME}
@@ -0,0 +1,68 @@
+"""Incremental tracking: S3 sequencers order the events applied to each key."""
+
+import json
+import time
+
+import pytest
+
+from conftest import BUCKET_NAME
+from s3_events import s3_event, s3_record
+
+CREATE_SEQ = '0055AED6DCD90281E5'
+LATE_CREATE_SEQ = '0055AED6DCD90281E6'
+DELETE_SEQ = '0055AED6DCD90281E7'
+
+
+@pytest.fixture
+def incremental(size_tracking, table, s3, monkeypatch):
+    monkeypatch.setattr(size_tracking, 'TRACKING_MODE', 'incremental')
+    # A recent recount, so the events alone move the totals
+    table.put_item(Item={
+        'bucket_name': BUCKET_NAME + '#state', 'timestamp': 0,
+        'total_size': 0, 'object_count': 0, 'last_recount': int(time.time()),
+    })
+    return size_tracking
+
+
+def totals(handler, *records):
+    response = handler.lambda_handler(s3_event(*records), None)
+    assert response['statusCode'] == 200
+    bucket = json.loads(response['body'])['buckets'][0]
+    return bucket['total_size'], bucket['object_count']
+
+
+def test_replayed_create_is_counted_once(incremental):
+    create = s3_record('a.txt', size=100, sequencer=CREATE_SEQ)
+    assert totals(incremental, create) == (100, 1)
+    assert totals(incremental, create) == (100, 1)
+
+
+def test_replayed_delete_is_subtracted_once(incremental):
+    assert totals(incremental, s3_record('a.txt', size=100, sequencer=CREATE_SEQ)) == (100, 1)
+    delete = s3_record('a.txt', 'ObjectRemoved:Delete', sequencer=DELETE_SEQ)
+    assert totals(incremental, delete) == (0, 0)
+    assert totals(incremental, delete) == (0, 0)
+
+
+def test_create_arriving_after_a_newer_delete_is_ignored(incremental, table):
+    assert totals(incremental, s3_record('a.txt', size=100, sequencer=CREATE_SEQ)) == (100, 1)
+    assert totals(incremental, s3_record('a.txt', 'ObjectRemoved:Delete', sequencer=DELETE_SEQ)) == (0, 0)
+    assert totals(incremental, s3_record('a.txt', size=250, sequencer=LATE_CREATE_SEQ)) == (0, 0)
+
+    tombstone = table.get_item(Key={'bucket_name': BUCKET_NAME + '#obj#a.txt', 'timestamp': 0})['Item']
+    assert tombstone['deleted']
+    assert tombstone['sequencer'] == DELETE_SEQ.rjust(32, '0')
+
+
+def test_delete_arriving_before_its_create_wins(incremental):
+    # Delivered out of order within one batch: the delete is newer
+    assert totals(
+        incremental,
+        s3_record('a.txt', 'ObjectRemoved:Delete', sequencer=DELETE_SEQ),
+        s3_record('a.txt', size=100, sequencer=CREATE_SEQ),
+    ) == (0, 0)
+
+
+def test_overwrite_replaces_the_remembered_size(incremental):
+    assert totals(incremental, s3_record('a.txt', size=100, sequencer=CREATE_SEQ)) == (100, 1)
+    assert totals(incremental, s3_record('a.txt', size=40, sequencer=LATE_CREATE_SEQ)) == (40, 1)
@@ -0,0 +1,106 @@
+"""
+A second write in the same second replaces the history row (whole-second
+precision); the stats item, rollups and the plot must follow the new value.
+"""
+
+import json
+import time
+
+import pytest
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeSerializer
+
+from conftest import BUCKET_NAME
+from s3_events import s3_event, s3_record
+
+_serializer = TypeSerializer()
+
+
+@pytest.fixture
+def same_second(size_tracking, monkeypatch):
+    timestamp = int(time.time()) - 5
+    monkeypatch.setattr(size_tracking, 'history_timestamp', lambda: timestamp)
+    return timestamp
+
+
+def track(handler, s3, size):
+    s3.put_object(Bucket=BUCKET_NAME, Key='a.txt', Body=b'x' * size)
+    response = handler.lambda_handler(s3_event(s3_record('a.txt', size=size)), None)
+    assert response['statusCode'] == 200
+
+
+def plot(plotting):
+    response = plotting.lambda_handler({
+        'resource': '/plot',
+        'queryStringParameters': {'bucket': BUCKET_NAME, 'window': '3600', 'renderer': 'svg'},
+    }, None)
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+
+def stats(table):
+    return table.get_item(Key={'bucket_name': BUCKET_NAME + '#stats', 'timestamp': 0})['Item']
+
+
+def test_overwrite_reaches_history_stats_and_rollups(size_tracking, table, s3, same_second):
+    track(size_tracking, s3, 300)
+    track(size_tracking, s3, 200)
+
+    rows = table.query(KeyConditionExpression=Key('bucket_name').eq(BUCKET_NAME))['Items']
+    assert [(int(r['timestamp']), int(r['total_size'])) for r in rows] == [(same_second, 200)]
+    assert int(stats(table)['last_size']) == 200
+    assert int(stats(table)['historical_high']) == 300
+    minute = table.get_item(Key={
+        'bucket_name': BUCKET_NAME + '#rollup#minute', 'timestamp': same_second // 60 * 60,
+    })['Item']
+    assert int(minute['last_size']) == 200
+    assert int(minute['sample_count']) == 1
+    assert (int(minute['min_size']), int(minute['max_size'])) == (200, 300)
+
+
+def test_overwrite_is_not_served_from_the_render_cache(size_tracking, plotting, table, s3, same_second):
+    track(size_tracking, s3, 300)
+    first = plot(plotting)
+    assert first['cache'] == 'miss'
+    before = s3.get_object(Bucket=BUCKET_NAME, Key='plot')['Body'].read()
+    # The plot lives in the tracked bucket; keep it out of the next total
+    s3.delete_object(Bucket=BUCKET_NAME, Key='plot')
+
+    # Same timestamp, same point count and historical high: only the value differs
+    track(size_tracking, s3, 200)
+    second = plot(plotting)
+    assert second['cache'] == 'miss'
+    assert (second['raw_points'], second['historical_high']) == (first['raw_points'], first['historical_high'])
+    assert s3.get_object(Bucket=BUCKET_NAME, Key='plot')['Body'].read() != before
+
+    assert plot(plotting)['cache'] == 'hit'
+
+
+def stream_record(event_name, sequence_number, item):
+    return {
+        'eventName': event_name,
+        'dynamodb': {
+            'SequenceNumber': sequence_number,
+            'NewImage': {k: _serializer.serialize(v) for k, v in item.items()},
+        },
+    }
+
+
+def history_row(timestamp, size):
+    return {
+        'bucket_name': BUCKET_NAME, 'timestamp': timestamp, 'total_size': size,
+        'object_count': 1, 'recorded_at': '2024-01-01T00:00:00Z',
+    }
+
+
+def test_stream_applies_the_replacing_write(stream_consumer, table, same_second):
+    response = stream_consumer.lambda_handler({'Records': [
+        stream_record('INSERT', '1', history_row(same_second, 300)),
+        stream_record('MODIFY', '2', history_row(same_second, 200)),
+        # Derived items never feed the aggregates
+        stream_record('MODIFY', '3', {'bucket_name': BUCKET_NAME + '#stats', 'timestamp': 0, 'last_size': 5}),
+    ]}, None)
+
+    assert response == {'batchItemFailures': []}
+    assert int(stats(table)['last_size']) == 200
+    assert int(stats(table)['historical_high']) == 300
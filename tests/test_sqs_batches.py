@@ -0,0 +1,80 @@
+"""SQS-buffered batches: failures are reported per message, not per batch."""
+
+import pytest
+from boto3.dynamodb.conditions import Key
+
+from conftest import BUCKET_NAME
+from s3_events import s3_record, sqs_event
+
+OTHER_BUCKET = 'other-bucket'
+
+
+@pytest.fixture
+def buckets(s3):
+    s3.create_bucket(Bucket=OTHER_BUCKET)
+    s3.put_object(Bucket=BUCKET_NAME, Key='a.txt', Body=b'x' * 10)
+    s3.put_object(Bucket=OTHER_BUCKET, Key='b.txt', Body=b'x' * 20)
+
+
+def history(table, bucket):
+    return table.query(KeyConditionExpression=Key('bucket_name').eq(bucket))['Items']
+
+
+def failed_ids(response):
+    return sorted(f['itemIdentifier'] for f in response['batchItemFailures'])
+
+
+def fail_for(size_tracking, monkeypatch, bucket):
+    build = size_tracking.build_history_item
+
+    def build_history_item(bucket_name, records, pending=None):
+        if bucket_name == bucket:
+            raise RuntimeError('throttled')
+        return build(bucket_name, records, pending)
+    monkeypatch.setattr(size_tracking, 'build_history_item', build_history_item)
+
+
+def test_only_the_failing_buckets_messages_are_reported(size_tracking, table, buckets, monkeypatch):
+    fail_for(size_tracking, monkeypatch, OTHER_BUCKET)
+    response = size_tracking.lambda_handler(sqs_event({
+        'm1': [s3_record('a.txt')],
+        'm2': [s3_record('b.txt', bucket=OTHER_BUCKET)],
+        # Carries records of both buckets; reported once
+        'm3': [s3_record('a.txt'), s3_record('b.txt', bucket=OTHER_BUCKET)],
+    }), None)
+
+    assert failed_ids(response) == ['m2', 'm3']
+    assert [int(row['total_size']) for row in history(table, BUCKET_NAME)] == [10]
+    assert history(table, OTHER_BUCKET) == []
+
+
+def test_unparsable_messages_are_reported(size_tracking, table, buckets):
+    event = sqs_event({'m1': [s3_record('a.txt')]})
+    event['Records'].append({'messageId': 'bad', 'eventSource': 'aws:sqs', 'body': 'not json'})
+    response = size_tracking.lambda_handler(event, None)
+
+    assert failed_ids(response) == ['bad']
+    assert len(history(table, BUCKET_NAME)) == 1
+
+
+def test_failed_write_reports_every_message_that_fed_a_row(size_tracking, table, buckets, monkeypatch):
+    def write_to_dynamodb(items, snapshots=None, unique=False):
+        raise RuntimeError('throttled')
+    monkeypatch.setattr(size_tracking, 'write_to_dynamodb', write_to_dynamodb)
+    response = size_tracking.lambda_handler(sqs_event({
+        'm1': [s3_record('a.txt')],
+        'm2': [s3_record('b.txt', bucket=OTHER_BUCKET)],
+    }), None)
+
+    assert failed_ids(response) == ['m1', 'm2']
+
+
+def test_s3_test_event_is_acknowledged(size_tracking, table, buckets):
+    event = sqs_event({})
+    event['Records'].append({
+        'messageId': 'test', 'eventSource': 'aws:sqs',
+        'body': '{"Service": "Amazon S3", "Event": "s3:TestEvent", "Bucket": "tracked-bucket"}',
+    })
+    response = size_tracking.lambda_handler(event, None)
+
+    assert response['batchItemFailures'] == []